@@ -0,0 +1,148 @@
+# ai/abstraction.py
+from typing import List, Dict
+from .cards import RANK_OF, SUIT_OF, card_to_str
+from .isomorphism import LINES, LINE_SIZES, canonicalize
+from .game_state import GameState
+
+# Классы рангов: 2-9, T-J, Q, K, A
+RANK_CLASS = (0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 2, 3, 4)
+
+class CardAbstraction:
+    """Базовый класс абстракции: отображает состояние игры в ключ информационного набора"""
+
+    name = 'base'
+
+    def bucket(self, game_state: GameState) -> str:
+        """Возвращает ключ корзины для состояния игры"""
+        raise NotImplementedError
+
+class ExactAbstraction(CardAbstraction):
+    """
+    Без абстракции: ключ содержит точные карты линий, руки и видимые карты
+
+    Масти перенумерованы в канонический порядок, поэтому состояния, отличающиеся
+    только перестановкой мастей, попадают в один набор.
+    """
+
+    name = 'exact'
+
+    def bucket(self, game_state: GameState) -> str:
+        table = game_state.table
+        groups = [table[line] for line in LINES]
+        groups.append(game_state.hand)
+        groups.append(game_state.visible_cards)
+
+        # Линии стола, карты на руке и видимые карты
+        info_parts = [''.join(card_to_str(c) for c in cards) for cards in canonicalize(groups)]
+
+        if game_state.fantasy_mode:
+            info_parts.append('F')
+
+        return '|'.join(info_parts)
+
+class PatternAbstraction(CardAbstraction):
+    """
+    Абстракция по шаблонам рангов
+
+    Линия описывается заполненностью, шаблоном групп рангов, флеш- и стрит-дро.
+    Верхняя линия - классом старшей группы, статусом фантазии и аутами на QQ+. Карта руки - классом ранга и тем, с какими линиями
+    она совпадает по рангу и масти. Ключи не зависят от конкретных мастей и
+    рангов внутри класса, поэтому число корзин ограничено.
+    """
+
+    name = 'pattern'
+
+    def bucket(self, game_state: GameState) -> str:
+        table = game_state.table
+        hand = sorted(game_state.hand, reverse=True)
+
+        unseen_ranks = [4] * 13
+        seen = [card for line in LINES for card in table.get(line, [])]
+        seen += hand
+        seen += game_state.visible_cards
+        for card in seen:
+            unseen_ranks[RANK_OF[card]] -= 1
+
+        parts = [self._line_pattern(table.get(line, []), LINE_SIZES[line]) for line in LINES]
+        parts.append(self._fantasy_status(table.get('top', []), unseen_ranks))
+        parts.append(''.join(self._hand_card(card, hand, table) for card in hand))
+
+        if game_state.fantasy_mode:
+            parts.append('F')
+
+        return '|'.join(parts)
+
+    def _line_pattern(self, cards: List[int], size: int) -> str:
+        """Шаблон линии: заполненность, группы рангов, флеш- и стрит-дро"""
+        if not cards:
+            return '0'
+
+        counts = [0] * 13
+        suits = [0] * 4
+        for card in cards:
+            counts[RANK_OF[card]] += 1
+            suits[SUIT_OF[card]] += 1
+
+        groups = sorted((c for c in counts if c > 1), reverse=True)
+        best_group = max(range(13), key=lambda r: (counts[r], r))
+        pattern = f"{len(cards)}{''.join(map(str, groups)) or '1'}"
+
+        # Для верхней линии важен класс старшей карты (фантазия)
+        if size == 3:
+            pattern += str(RANK_CLASS[best_group])
+
+        if size == 5 and size > len(cards) >= 2:
+            # Флеш-дро: все карты одной масти
+            if max(suits) == len(cards):
+                pattern += 'f'
+            # Стрит-дро: разные ранги в окне из пяти
+            ranks = [r for r in range(13) if counts[r]]
+            if not groups and ranks[-1] - ranks[0] <= 4:
+                pattern += 's'
+        return pattern
+
+    def _fantasy_status(self, top: List[int], unseen_ranks: List[int]) -> str:
+        """Статус фантазии: собрана (F), дро на QQ+ с несколькими (D) или одним (d) аутом"""
+        counts = [0] * 13
+        for card in top:
+            counts[RANK_OF[card]] += 1
+        if any(counts[r] >= 2 for r in (10, 11, 12)) or max(counts) >= 3:
+            return 'F'
+        if len(top) < 3:
+            outs = sum(unseen_ranks[r] for r in (10, 11, 12) if counts[r] == 1)
+            if outs:
+                return 'D' if outs > 1 else 'd'
+        return ''
+
+    def _hand_card(self, card: int, hand: List[int], table: Dict) -> str:
+        """Описание карты руки: класс ранга и совпадения по рангу и масти с линиями"""
+        rank, suit = RANK_OF[card], SUIT_OF[card]
+
+        pair_mask = 0
+        flush_draw = 0
+        for i, line in enumerate(LINES):
+            line_cards = table.get(line, [])
+            if any(RANK_OF[c] == rank for c in line_cards):
+                pair_mask |= 1 << i
+            if len(line_cards) >= 2 and i > 0 and all(SUIT_OF[c] == suit for c in line_cards):
+                flush_draw = 1
+        description = f"{RANK_CLASS[rank]}{pair_mask}{flush_draw}"
+
+        # В начальной раздаче важны пары и одномастность внутри руки
+        if not any(table.get(line) for line in LINES):
+            same_rank = sum(1 for c in hand if RANK_OF[c] == rank) - 1
+            same_suit = sum(1 for c in hand if SUIT_OF[c] == suit) - 1
+            description += f"{same_rank}{min(same_suit, 2)}"
+        return description + '.'
+
+# Реестр доступных абстракций
+ABSTRACTIONS = {
+    ExactAbstraction.name: ExactAbstraction,
+    PatternAbstraction.name: PatternAbstraction
+}
+
+def make_abstraction(name: str) -> CardAbstraction:
+    """Создает абстракцию по имени"""
+    if name not in ABSTRACTIONS:
+        raise ValueError(f"Unknown abstraction: {name}")
+    return ABSTRACTIONS[name]()
@@ -0,0 +1,88 @@
+# ai/cards.py
+from typing import List, Dict, Iterable, Union
+
+# Карта кодируется целым числом 0..51: card = rank * 4 + suit
+RANKS = '23456789TJQKA'
+SUITS = '♠♣♥♦'
+NUM_CARDS = 52
+
+# Подписи рангов на JSON-границе (фронтенд использует '10' вместо 'T')
+RANK_LABELS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+RANK_INDEX = {r: i for i, r in enumerate(RANKS)}
+RANK_INDEX['10'] = RANKS.index('T')
+SUIT_INDEX = {s: i for i, s in enumerate(SUITS)}
+
+# Таблицы поиска по номеру карты
+RANK_OF = tuple(c >> 2 for c in range(NUM_CARDS))
+SUIT_OF = tuple(c & 3 for c in range(NUM_CARDS))
+RANK_BIT = tuple(1 << (c >> 2) for c in range(NUM_CARDS))
+CARD_BIT = tuple(1 << c for c in range(NUM_CARDS))
+FULL_MASK = (1 << NUM_CARDS) - 1
+
+CardLike = Union[int, str, Dict]
+
+
+def make_card(rank: int, suit: int) -> int:
+    """Собирает карту из индексов ранга и масти"""
+    return (rank << 2) | suit
+
+
+def card_from_dict(card: Dict) -> int:
+    """Преобразует карту {'rank', 'suit'} в целое число"""
+    return (RANK_INDEX[card['rank']] << 2) | SUIT_INDEX[card['suit']]
+
+
+def card_to_dict(card: int) -> Dict:
+    """Преобразует целое число в карту {'rank', 'suit'}"""
+    return {'rank': RANK_LABELS[card >> 2], 'suit': SUITS[card & 3]}
+
+
+def card_from_str(card: str) -> int:
+    """Преобразует строку вида 'A♠' или '10♥' в целое число"""
+    return (RANK_INDEX[card[:-1]] << 2) | SUIT_INDEX[card[-1]]
+
+
+def card_to_str(card: int) -> str:
+    """Преобразует целое число в строку вида 'A♠'"""
+    return f"{RANK_LABELS[card >> 2]}{SUITS[card & 3]}"
+
+
+def to_card(card: CardLike) -> int:
+    """Приводит карту из любого внешнего формата к целому числу"""
+    if isinstance(card, bool):
+        raise ValueError(f"Invalid card: {card}")
+    if isinstance(card, int):
+        if not 0 <= card < NUM_CARDS:
+            raise ValueError(f"Card out of range: {card}")
+        return card
+    if isinstance(card, str):
+        return card_from_str(card)
+    return card_from_dict(card)
+
+
+def cards_from_json(cards: Iterable) -> List[int]:
+    """Преобразует список карт с JSON-границы, пропуская пустые слоты"""
+    return [to_card(card) for card in cards if card or card == 0]
+
+
+def cards_to_json(cards: Iterable[int]) -> List[Dict]:
+    """Преобразует список целых карт в список словарей для JSON"""
+    return [card_to_dict(card) for card in cards]
+
+
+def cards_mask(cards: Iterable[int]) -> int:
+    """Возвращает 52-битную маску набора карт"""
+    mask = 0
+    for card in cards:
+        mask |= CARD_BIT[card]
+    return mask
+
+
+def mask_to_cards(mask: int) -> List[int]:
+    """Возвращает список карт, отмеченных в маске"""
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(low.bit_length() - 1)
+        mask ^= low
+    return cards
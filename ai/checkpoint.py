@@ -0,0 +1,137 @@
+# ai/checkpoint.py
+from typing import Dict, Tuple, Union, BinaryIO
+import io
+import json
+import struct
+import zlib
+import numpy as np
+
+MAGIC = b'OFCCKPT\x00'
+VERSION = 1
+ALIGNMENT = 64  # Выравнивание массивов в файле (для отображения в память)
+
+_PREAMBLE = struct.Struct('<8sII')  # Сигнатура, версия, длина заголовка
+
+class CheckpointError(ValueError):
+    """Файл не является контрольной точкой поддерживаемой версии"""
+
+def _align(position: int) -> int:
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def save_checkpoint(target: Union[str, BinaryIO], meta: Dict, arrays: Dict[str, np.ndarray],
+                    compress: bool = False) -> None:
+    """
+    Записывает контрольную точку: JSON-заголовок и сырые массивы NumPy
+
+    Формат: сигнатура, версия и длина заголовка; заголовок с метаданными и
+    описанием массивов (тип, форма, смещение, размер); затем данные массивов,
+    выровненные по ALIGNMENT. Сжатые (zlib) массивы нельзя отобразить в память.
+
+    Args:
+        target: Путь к файлу или открытый бинарный файл
+        meta: JSON-совместимые метаданные
+        arrays: Именованные массивы
+        compress: Сжимать ли массивы
+    """
+    blobs = []
+    descriptions = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        blob = array.tobytes()
+        if compress:
+            blob = zlib.compress(blob, 1)
+        descriptions[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'nbytes': len(blob)
+        }
+        blobs.append((name, blob))
+
+    # Смещения зависят от длины заголовка, а она - от смещений: считаем с запасом
+    header = {'meta': meta, 'codec': 'zlib' if compress else None, 'arrays': descriptions}
+    reserve = len(json.dumps(header)) + 32 * len(blobs) + 64
+    position = _align(_PREAMBLE.size + reserve)
+    for name, blob in blobs:
+        descriptions[name]['offset'] = position
+        position = _align(position + len(blob))
+    header_bytes = json.dumps(header).encode()
+    if len(header_bytes) > reserve:
+        raise CheckpointError("Checkpoint header does not fit its reserved space")
+    header_bytes += b' ' * (reserve - len(header_bytes))
+
+    def write(f: BinaryIO) -> None:
+        start = f.tell()
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, blob in blobs:
+            f.write(b'\x00' * (start + descriptions[name]['offset'] - f.tell()))
+            f.write(blob)
+
+    if isinstance(target, str):
+        with open(target, 'wb') as f:
+            write(f)
+    else:
+        write(target)
+
+def dumps_checkpoint(meta: Dict, arrays: Dict[str, np.ndarray], compress: bool = False) -> bytes:
+    """Контрольная точка в виде байтов"""
+    buffer = io.BytesIO()
+    save_checkpoint(buffer, meta, arrays, compress)
+    return buffer.getvalue()
+
+def load_checkpoint(source: Union[str, bytes], mmap: bool = True) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    Читает контрольную точку
+
+    Args:
+        source: Путь к файлу или байты контрольной точки
+        mmap: Отображать несжатые массивы файла в память (копирование при записи)
+
+    Returns:
+        Tuple: (метаданные, именованные массивы)
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            header_bytes = _check_preamble(f.read(_PREAMBLE.size), f.read)
+        data = None
+    else:
+        data = bytes(source)
+        header_bytes = _check_preamble(data[:_PREAMBLE.size],
+                                       io.BytesIO(data[_PREAMBLE.size:]).read)
+
+    header = json.loads(header_bytes)
+    compressed = header.get('codec') == 'zlib'
+    if data is None and (compressed or not mmap):
+        with open(source, 'rb') as f:
+            data = f.read()
+
+    arrays = {}
+    for name, description in header['arrays'].items():
+        dtype = np.dtype(description['dtype'])
+        shape = tuple(description['shape'])
+        offset = description['offset']
+        nbytes = description['nbytes']
+
+        if data is None:
+            if nbytes == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(source, dtype=dtype, mode='c', offset=offset, shape=shape)
+        else:
+            raw = data[offset:offset + nbytes]
+            if compressed:
+                raw = zlib.decompress(raw)
+            arrays[name] = np.frombuffer(raw, dtype=dtype).reshape(shape).copy()
+
+    return header['meta'], arrays
+
+def _check_preamble(preamble: bytes, read) -> bytes:
+    """Проверяет сигнатуру и версию, возвращает байты заголовка"""
+    if len(preamble) < _PREAMBLE.size:
+        raise CheckpointError("Truncated checkpoint")
+    magic, version, header_len = _PREAMBLE.unpack(preamble)
+    if magic != MAGIC:
+        raise CheckpointError("Not a checkpoint file")
+    if version > VERSION:
+        raise CheckpointError(f"Unsupported checkpoint version: {version}")
+    return read(header_len)
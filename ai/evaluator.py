@@ -1,278 +1,308 @@
-# ai/evaluator.py (Часть 1)
-from typing import List, Dict
+# ai/evaluator.py
+from typing import List, Dict, Tuple
 from collections import Counter
+from itertools import combinations, combinations_with_replacement
+import numpy as np
+from .cards import RANKS, SUITS, NUM_CARDS, RANK_OF, SUIT_OF, RANK_BIT
+
+# Категории комбинаций от слабейшей к сильнейшей
+HIGH_CARD, PAIR, TWO_PAIR, TRIPS, STRAIGHT, FLUSH, FULL_HOUSE, QUADS, STRAIGHT_FLUSH, ROYAL_FLUSH = range(10)
+
+# Сила руки: category * CATEGORY_BASE + ранги по значимости в системе по основанию 13.
+# Верхняя линия кодируется в той же шкале, поэтому её можно напрямую сравнивать со средней.
+CATEGORY_BASE = 13 ** 5
+MAX_STRENGTH = (ROYAL_FLUSH + 1) * CATEGORY_BASE
+
+PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+PRIME_OF = tuple(PRIMES[RANK_OF[c]] for c in range(NUM_CARDS))
+
+# Бонусы по категориям для средней и нижней линий
+MIDDLE_ROYALTY = (0, 0, 0, 2, 4, 8, 12, 20, 30, 50)
+BOTTOM_ROYALTY = (0, 0, 0, 0, 2, 4, 6, 10, 15, 25)
+
+
+def _strength(category: int, ranks: List[int]) -> int:
+    """Кодирует категорию и ранги (от старшего по значимости) в одно число"""
+    value = 0
+    for i, rank in enumerate(ranks):
+        value += rank * 13 ** (4 - i)
+    return category * CATEGORY_BASE + value
+
+
+def _significant_ranks(ranks: Tuple[int, ...]) -> Tuple[List[int], List[int]]:
+    """Возвращает ранги групп по убыванию (размер группы, ранг) и размеры групп"""
+    counts = Counter(ranks)
+    order = sorted(counts, key=lambda r: (counts[r], r), reverse=True)
+    return order, [counts[r] for r in order]
+
+
+def _straight_high(ranks: Tuple[int, ...]) -> int:
+    """Старшая карта стрита или -1, если это не стрит"""
+    values = sorted(set(ranks))
+    if len(values) != 5:
+        return -1
+    if values[-1] - values[0] == 4:
+        return values[-1]
+    if values == [0, 1, 2, 3, 12]:  # Колесо A-5
+        return 3
+    return -1
+
+
+def _build_five_card_tables() -> Tuple[Dict[int, int], List[int]]:
+    """Строит таблицы для 5 карт: по произведению простых и по маске рангов флеша"""
+    product_table = {}
+    for ranks in combinations_with_replacement(range(13), 5):
+        order, groups = _significant_ranks(ranks)
+        if groups[0] > 4:
+            continue
+        high = _straight_high(ranks)
+        if high >= 0:
+            value = _strength(STRAIGHT, [high])
+        elif groups[0] == 4:
+            value = _strength(QUADS, order)
+        elif groups == [3, 2]:
+            value = _strength(FULL_HOUSE, order)
+        elif groups[0] == 3:
+            value = _strength(TRIPS, order)
+        elif groups[:2] == [2, 2]:
+            value = _strength(TWO_PAIR, order)
+        elif groups[0] == 2:
+            value = _strength(PAIR, order)
+        else:
+            value = _strength(HIGH_CARD, order)
+        key = 1
+        for rank in ranks:
+            key *= PRIMES[rank]
+        product_table[key] = value
+
+    flush_table = [0] * (1 << 13)
+    for ranks in combinations(range(13), 5):
+        mask = 0
+        for rank in ranks:
+            mask |= 1 << rank
+        high = _straight_high(ranks)
+        if high == 12:
+            value = _strength(ROYAL_FLUSH, [high])
+        elif high >= 0:
+            value = _strength(STRAIGHT_FLUSH, [high])
+        else:
+            value = _strength(FLUSH, sorted(ranks, reverse=True))
+        flush_table[mask] = value
+    return product_table, flush_table
+
+
+def _build_three_card_table() -> Dict[int, int]:
+    """Строит таблицу для верхней линии по произведению простых"""
+    table = {}
+    for ranks in combinations_with_replacement(range(13), 3):
+        order, groups = _significant_ranks(ranks)
+        if groups[0] == 3:
+            value = _strength(TRIPS, order)
+        elif groups[0] == 2:
+            value = _strength(PAIR, order)
+        else:
+            value = _strength(HIGH_CARD, order)
+        table[PRIMES[ranks[0]] * PRIMES[ranks[1]] * PRIMES[ranks[2]]] = value
+    return table
+
+
+def top_royalty(value: int) -> int:
+    """Бонус верхней линии по её силе (66 = 1 ... AA = 9, сеты 222 = 10 ... AAA = 22)"""
+    category, rank = divmod(value, CATEGORY_BASE)
+    rank //= 13 ** 4
+    if category == TRIPS:
+        return 10 + rank
+    if category == PAIR and rank >= 4:
+        return rank - 3
+    return 0
+
+
+def top_fantasy_cards(value: int) -> int:
+    """Количество карт фантазии по силе верхней линии (как в PineappleRules.check_fantasy)"""
+    category, rank = divmod(value, CATEGORY_BASE)
+    rank //= 13 ** 4
+    if category >= PAIR and rank >= 10:
+        return 14 + rank - 10
+    if category == TRIPS:
+        return 17
+    return 0
+
+
+FIVE_CARD_TABLE, FLUSH_TABLE = _build_five_card_tables()
+THREE_CARD_TABLE = _build_three_card_table()
+
+# Те же таблицы в виде массивов для векторной оценки
+PRIME_ARRAY = np.array(PRIME_OF, dtype=np.int64)
+RANK_BIT_ARRAY = np.array(RANK_BIT, dtype=np.int64)
+FLUSH_ARRAY = np.array(FLUSH_TABLE, dtype=np.int64)
+FIVE_KEYS = np.array(sorted(FIVE_CARD_TABLE), dtype=np.int64)
+FIVE_VALUES = np.array([FIVE_CARD_TABLE[k] for k in FIVE_KEYS.tolist()], dtype=np.int64)
+THREE_KEYS = np.array(sorted(THREE_CARD_TABLE), dtype=np.int64)
+THREE_VALUES = np.array([THREE_CARD_TABLE[k] for k in THREE_KEYS.tolist()], dtype=np.int64)
+THREE_ROYALTY = np.array([top_royalty(v) for v in THREE_VALUES.tolist()], dtype=np.int64)
+THREE_FANTASY = np.array([top_fantasy_cards(v) for v in THREE_VALUES.tolist()], dtype=np.int64)
+MIDDLE_ROYALTY_ARRAY = np.array(MIDDLE_ROYALTY, dtype=np.int64)
+BOTTOM_ROYALTY_ARRAY = np.array(BOTTOM_ROYALTY, dtype=np.int64)
+
 
 class HandEvaluator:
-    RANKS = '23456789TJQKA'
-    SUITS = '♠♣♥♦'
-    
+    RANKS = RANKS
+    SUITS = SUITS
+
     @staticmethod
-    def evaluate_top(cards: List[Dict]) -> float:
+    def category(value: int) -> int:
+        """Возвращает категорию комбинации по её силе"""
+        return value // CATEGORY_BASE
+
+    @staticmethod
+    def evaluate_top(cards: List[int]) -> int:
         """Оценка комбинации верхней линии"""
         if not cards or len(cards) != 3:
             return 0
-            
-        ranks = [card['rank'] for card in cards]
-        rank_counts = Counter(ranks)
-        
-        # Проверяем сет
-        if 3 in rank_counts.values():
-            rank = [r for r, c in rank_counts.items() if c == 3][0]
-            return 10 + HandEvaluator.RANKS.index(rank)
-            
-        # Проверяем пару
-        if 2 in rank_counts.values():
-            pair_rank = [r for r, c in rank_counts.items() if c == 2][0]
-            kicker = [r for r, c in rank_counts.items() if c == 1][0]
-            return 5 + HandEvaluator.RANKS.index(pair_rank) * 0.1
-            
-        # Старшая карта
-        highest_rank = max(ranks, key=lambda x: HandEvaluator.RANKS.index(x))
-        return HandEvaluator.RANKS.index(highest_rank) * 0.1
+        a, b, c = cards
+        return THREE_CARD_TABLE[PRIME_OF[a] * PRIME_OF[b] * PRIME_OF[c]]
 
     @staticmethod
-    def evaluate_middle(cards: List[Dict]) -> float:
+    def evaluate_middle(cards: List[int]) -> int:
         """Оценка комбинации средней линии"""
         return HandEvaluator._evaluate_five_cards(cards, is_middle=True)
-        
+
     @staticmethod
-    def evaluate_bottom(cards: List[Dict]) -> float:
+    def evaluate_bottom(cards: List[int]) -> int:
         """Оценка комбинации нижней линии"""
         return HandEvaluator._evaluate_five_cards(cards, is_middle=False)
-        
+
     @staticmethod
-    def _evaluate_five_cards(cards: List[Dict], is_middle: bool) -> float:
+    def _evaluate_five_cards(cards: List[int], is_middle: bool) -> int:
         if not cards or len(cards) != 5:
             return 0
-            
-        ranks = [card['rank'] for card in cards]
-        suits = [card['suit'] for card in cards]
-        
-        rank_counts = Counter(ranks)
-        suit_counts = Counter(suits)
-        
-        # Проверяем комбинации от старшей к младшей
-        # Роял-флеш
-        if (len(set(suits)) == 1 and 
-            set(ranks) == set('TJQKA')):
-            return 9000 + (1.5 if is_middle else 1)
-            
-        # Стрит-флеш
-        if len(set(suits)) == 1:
-            rank_values = sorted([HandEvaluator.RANKS.index(r) for r in ranks])
-            if rank_values[-1] - rank_values[0] == 4:
-                return 8000 + rank_values[-1] + (1.5 if is_middle else 1)
-                
-        # Каре
-        if 4 in rank_counts.values():
-            quads_rank = [r for r, c in rank_counts.items() if c == 4][0]
-            kicker = [r for r, c in rank_counts.items() if c == 1][0]
-            return 7000 + HandEvaluator.RANKS.index(quads_rank) * 13 + HandEvaluator.RANKS.index(kicker)
-            
-        # Фулл-хаус
-        if 3 in rank_counts.values() and 2 in rank_counts.values():
-            three_rank = [r for r, c in rank_counts.items() if c == 3][0]
-            pair_rank = [r for r, c in rank_counts.items() if c == 2][0]
-            return 6000 + HandEvaluator.RANKS.index(three_rank) * 13 + HandEvaluator.RANKS.index(pair_rank)
-            
-        # Флеш
-        if len(set(suits)) == 1:
-            rank_values = sorted([HandEvaluator.RANKS.index(r) for r in ranks])
-            return 5000 + sum(rank_values[i] * pow(13, i) for i in range(5))
-            
-        # Стрит
-        rank_values = sorted([HandEvaluator.RANKS.index(r) for r in ranks])
-        if rank_values[-1] - rank_values[0] == 4:
-            return 4000 + rank_values[-1]
-            
-        # Сет
-        if 3 in rank_counts.values():
-            three_rank = [r for r, c in rank_counts.items() if c == 3][0]
-            kickers = sorted([r for r, c in rank_counts.items() if c == 1],
-                           key=lambda x: HandEvaluator.RANKS.index(x))
-            return 3000 + HandEvaluator.RANKS.index(three_rank) * 169 + HandEvaluator.RANKS.index(kickers[1]) * 13 + HandEvaluator.RANKS.index(kickers[0])
-            
-        # Две пары
-        if list(rank_counts.values()).count(2) == 2:
-            pairs = sorted([r for r, c in rank_counts.items() if c == 2],
-                         key=lambda x: HandEvaluator.RANKS.index(x))
-            kicker = [r for r, c in rank_counts.items() if c == 1][0]
-            return 2000 + HandEvaluator.RANKS.index(pairs[1]) * 169 + HandEvaluator.RANKS.index(pairs[0]) * 13 + HandEvaluator.RANKS.index(kicker)
-            
-        # Пара
-        if 2 in rank_counts.values():
-            pair_rank = [r for r, c in rank_counts.items() if c == 2][0]
-            kickers = sorted([r for r, c in rank_counts.items() if c == 1],
-                           key=lambda x: HandEvaluator.RANKS.index(x))
-            return 1000 + HandEvaluator.RANKS.index(pair_rank) * 2197 + sum(HandEvaluator.RANKS.index(k) * pow(13, i) for i, k in enumerate(kickers))
-            
-        # Старшая карта
-        rank_values = sorted([HandEvaluator.RANKS.index(r) for r in ranks])
-        return sum(rank_values[i] * pow(13, i) for i in range(5))
-
-    def _get_middle_royalty(self, cards: List[Dict]) -> int:
-        """Подсчитывает бонусы за среднюю линию"""
-        value = self.evaluate_middle(cards)
-        # Проверяем комбинации от старшей к младшей
-        if value >= 9000:  # Роял-флеш
-            return 50
-        if value >= 8000:  # Стрит-флеш
-            return 30
-        if value >= 7000:  # Каре
-            return 20
-        if value >= 6000:  # Фулл-хаус
-            return 12
-        if value >= 5000:  # Флеш
-            return 8
-        if value >= 4000:  # Стрит
-            return 4
-        if value >= 3000:  # Сет
-            return 2
-            
-        return 0
-
-    def _get_bottom_royalty(self, cards: List[Dict]) -> int:
-    """Подсчитывает бонусы за нижнюю линию"""
-        value = self.evaluate_bottom(cards)
-        
-        # Проверяем комбинации от старшей к младшей
-        if value >= 9000:  # Роял-флеш
-            return 25
-        if value >= 8000:  # Стрит-флеш
-            return 15
-            if value >= 7000:  # Каре
-            return 10
-        if value >= 6000:  # Фулл-хаус
-            return 6
-        if value >= 5000:  # Флеш
-            return 4
-        if value >= 4000:  # Стрит
-            return 2
-            
-        return 0
+
+        a, b, c, d, e = cards
+        if SUIT_OF[a] == SUIT_OF[b] == SUIT_OF[c] == SUIT_OF[d] == SUIT_OF[e]:
+            return FLUSH_TABLE[RANK_BIT[a] | RANK_BIT[b] | RANK_BIT[c] | RANK_BIT[d] | RANK_BIT[e]]
+        return FIVE_CARD_TABLE[PRIME_OF[a] * PRIME_OF[b] * PRIME_OF[c] * PRIME_OF[d] * PRIME_OF[e]]
+
+    @staticmethod
+    def evaluate_batch(boards: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Оценивает сразу N полных досок за один векторный проход
+
+        Args:
+            boards: Массив (N, 13) целых карт: 0-2 верх, 3-7 середина, 8-12 низ
+
+        Returns:
+            Dict: 'strengths' (N, 3), 'foul' (N,), 'royalties' (N, 3) и
+            'fantasy_cards' (N,); у мертвых рук бонусы и фантазия обнулены
+        """
+        boards = np.asarray(boards, dtype=np.int64)
+        if boards.ndim != 2 or boards.shape[1] != 13:
+            raise ValueError("boards must have shape (N, 13)")
+
+        primes = PRIME_ARRAY[boards]
+        top_index = np.searchsorted(THREE_KEYS, primes[:, :3].prod(axis=1))
+        top = THREE_VALUES[top_index]
+        middle = HandEvaluator._evaluate_five_batch(boards[:, 3:8], primes[:, 3:8])
+        bottom = HandEvaluator._evaluate_five_batch(boards[:, 8:], primes[:, 8:])
+
+        foul = (top > middle) | (middle > bottom)
+        alive = ~foul
+
+        royalties = np.stack([
+            THREE_ROYALTY[top_index],
+            MIDDLE_ROYALTY_ARRAY[middle // CATEGORY_BASE],
+            BOTTOM_ROYALTY_ARRAY[bottom // CATEGORY_BASE]
+        ], axis=1) * alive[:, None]
+        fantasy_cards = THREE_FANTASY[top_index] * alive
+
+        return {
+            'strengths': np.stack([top, middle, bottom], axis=1),
+            'foul': foul,
+            'royalties': royalties,
+            'fantasy': fantasy_cards > 0,
+            'fantasy_cards': fantasy_cards
+        }
+
+    @staticmethod
+    def _evaluate_five_batch(cards: np.ndarray, primes: np.ndarray) -> np.ndarray:
+        """Векторная оценка массива (N, 5) линий из пяти карт"""
+        suits = cards & 3
+        is_flush = (suits == suits[:, :1]).all(axis=1)
+        rank_mask = np.bitwise_or.reduce(RANK_BIT_ARRAY[cards], axis=1)
+        index = np.searchsorted(FIVE_KEYS, primes.prod(axis=1))
+        return np.where(is_flush, FLUSH_ARRAY[rank_mask], FIVE_VALUES[np.minimum(index, len(FIVE_KEYS) - 1)])
 
     def evaluate_fantasy_potential(self, hand: Dict) -> float:
         """Оценивает потенциал для фантазии"""
         if not hand or 'top' not in hand:
             return 0.0
-            
+
         top_cards = hand['top']
         if not top_cards or len(top_cards) != 3:
             return 0.0
-            
-        ranks = [card['rank'] for card in top_cards]
-        rank_counts = {}
-        for rank in ranks:
-            rank_counts[rank] = rank_counts.get(rank, 0) + 1
-        
+
+        rank_counts = [0] * 13
+        for card in top_cards:
+            rank_counts[RANK_OF[card]] += 1
+
         # Оцениваем потенциал от высшего к низшему
-        if any(rank_counts.get(r, 0) >= 3 for r in self.RANKS):  # Сет
+        if max(rank_counts) >= 3:  # Сет
             return 1.0
-        if rank_counts.get('A', 0) >= 2:  # AA
+        if rank_counts[12] >= 2:  # AA
             return 0.9
-        if rank_counts.get('K', 0) >= 2:  # KK
+        if rank_counts[11] >= 2:  # KK
             return 0.8
-        if rank_counts.get('Q', 0) >= 2:  # QQ
+        if rank_counts[10] >= 2:  # QQ
             return 0.7
-            
-        # Оцениваем близость к фантазии
-        high_pairs = sum(1 for r in 'QKA' if rank_counts.get(r, 0) >= 2)
-        if high_pairs > 0:
-            return 0.3 * high_pairs
-            
+
         # Оцениваем потенциал для сета
-        for rank in self.RANKS:
-            if rank_counts.get(rank, 0) == 2:
-                return 0.2  # Есть пара, возможен сет
-                
-        return 0.0
+        if 2 in rank_counts:
+            return 0.2  # Есть пара, возможен сет
 
-    def _rank_to_value(self, rank: str) -> int:
-        """Преобразует ранг карты в числовое значение"""
-        return self.RANKS.index(rank)
-
-    def _is_straight(self, ranks: List[str]) -> bool:
-        """Проверяет является ли комбинация стритом"""
-        values = sorted([self._rank_to_value(r) for r in ranks])
-        if values[-1] - values[0] == 4:  # Обычный стрит
-            return True
-        # Проверяем колесо (A-5)
-        if set(ranks) == {'A', '2', '3', '4', '5'}:
-            return True
-        return False
-
-    def _get_kickers(self, ranks: List[str], exclude_ranks: List[str]) -> List[str]:
-        """Получает список кикеров, исключая определенные ранги"""
-        kickers = [r for r in ranks if r not in exclude_ranks]
-        return sorted(kickers, key=lambda x: self._rank_to_value(x), reverse=True)
+        return 0.0
 
     def calculate_hand_strength(self, hand: Dict) -> float:
         """Вычисляет общую силу руки"""
         if not all(key in hand for key in ['top', 'middle', 'bottom']):
             return 0.0
-            
+
         top_value = self.evaluate_top(hand['top'])
         middle_value = self.evaluate_middle(hand['middle'])
         bottom_value = self.evaluate_bottom(hand['bottom'])
-        
+
         # Проверяем правило возрастания силы
         if not (top_value <= middle_value <= bottom_value):
             return 0.0  # Мертвая рука
-            
+
         # Нормализуем значения
-        max_top = 22  # Максимальное значение для верхней линии (AAA)
-        max_middle = 9100  # Примерное максимальное значение для средней линии
-        max_bottom = 9100  # Примерное максимальное значение для нижней линии
-        
+        max_top = _strength(TRIPS, [12])  # Максимальное значение для верхней линии (AAA)
+
         normalized_top = top_value / max_top
-        normalized_middle = middle_value / max_middle
-        normalized_bottom = bottom_value / max_bottom
-        
+        normalized_middle = middle_value / MAX_STRENGTH
+        normalized_bottom = bottom_value / MAX_STRENGTH
+
         # Взвешенная сумма с учетом важности линий
         weighted_sum = (normalized_top * 0.2 +  # Верхняя линия менее важна
                        normalized_middle * 0.35 +
                        normalized_bottom * 0.45)
-                       
+
         return weighted_sum
 
-    def _get_middle_royalty(self, cards: List[Dict]) -> int:
+    @staticmethod
+    def hand_strength_batch(strengths: np.ndarray) -> np.ndarray:
+        """Векторный calculate_hand_strength для массива (N, 3) сил линий (без проверки на мертвую руку)"""
+        max_top = _strength(TRIPS, [12])
+        return (strengths[:, 0] / max_top * 0.2 +
+                strengths[:, 1] / MAX_STRENGTH * 0.35 +
+                strengths[:, 2] / MAX_STRENGTH * 0.45)
+
+    def _get_middle_royalty(self, cards: List[int]) -> int:
         """Подсчитывает бонусы за среднюю линию"""
-        value = self.evaluate_middle(cards)
-        
-        # Проверяем комбинации от сильнейшей к слабейшей
-        if value >= 9000:  # Роял-флеш
-            return 50
-        if value >= 8000:  # Стрит-флеш
-            return 30
-        if value >= 7000:  # Каре
-            return 20
-        if value >= 6000:  # Фулл-хаус
-            return 12
-        if value >= 5000:  # Флеш
-            return 8
-        if value >= 4000:  # Стрит
-            return 4
-        if value >= 3000:  # Сет
-            return 2
-            
-        return 0
-
-    def _get_bottom_royalty(self, cards: List[Dict]) -> int:
+        if len(cards) != 5:
+            return 0
+        return MIDDLE_ROYALTY[self.category(self.evaluate_middle(cards))]
+
+    def _get_bottom_royalty(self, cards: List[int]) -> int:
         """Подсчитывает бонусы за нижнюю линию"""
-        value = self.evaluate_bottom(cards)
-        
-        # Проверяем комбинации от сильнейшей к слабейшей
-        if value >= 9000:  # Роял-флеш
-            return 25
-        if value >= 8000:  # Стрит-флеш
-            return 15
-        if value >= 7000:  # Каре
-            return 10
-        if value >= 6000:  # Фулл-хаус
-            return 6
-        if value >= 5000:  # Флеш
-            return 4
-        if value >= 4000:  # Стрит
-            return 2
-            
-        return 0
+        if len(cards) != 5:
+            return 0
+        return BOTTOM_ROYALTY[self.category(self.evaluate_bottom(cards))]
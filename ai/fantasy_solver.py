@@ -0,0 +1,133 @@
+# ai/fantasy_solver.py
+from typing import List, Dict, Optional, Tuple
+from bisect import bisect_left
+from itertools import combinations
+import time
+from .evaluator import (HandEvaluator, CATEGORY_BASE, TRIPS, QUADS,
+                        MIDDLE_ROYALTY, BOTTOM_ROYALTY, top_royalty)
+from .cards import CARD_BIT
+
+class FantasySolver:
+    """Поиск лучшей раскладки фантазии методом ветвей и границ"""
+
+    def __init__(self, time_budget: float = 2.0, reentry_bonus: float = 10.0):
+        self.evaluator = HandEvaluator()
+        self.time_budget = time_budget      # Лимит времени на поиск (сек)
+        self.reentry_bonus = reentry_bonus  # Ценность повторной фантазии в очках
+
+    def solve(self, cards: List[int], time_budget: Optional[float] = None,
+              stats: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Находит раскладку с максимумом бонусов и повторной фантазии
+
+        Args:
+            cards: Карты фантазии (13-17 штук)
+            time_budget: Лимит времени в секундах (по умолчанию self.time_budget)
+            stats: Словарь, в который записывается объем поиска: 'layouts',
+                'steps', 'complete', 'elapsed', 'score'
+
+        Returns:
+            Dict или None: {'top', 'middle', 'bottom', 'discard'} лучшей найденной раскладки
+        """
+        if len(cards) < 13:
+            return None
+
+        budget = self.time_budget if time_budget is None else time_budget
+        started = time.perf_counter()
+        deadline = started + budget
+
+        fives = self._sorted_lines(cards, 5, self.evaluator.evaluate_bottom)
+        tops = self._sorted_lines(cards, 3, self.evaluator.evaluate_top)
+        five_keys = [-strength for strength, _, _ in fives]
+        top_keys = [-strength for strength, _, _ in tops]
+        top_scores = [self._top_score(strength) for strength, _, _ in tops]
+
+        best_score = float('-inf')
+        best_layout = None
+        layouts = 0
+        steps = 0  # Просмотренные пары нижней и средней линий, включая отсеченные
+        complete = True
+
+        for bottom_strength, bottom_mask, bottom in fives:
+            bottom_category = bottom_strength // CATEGORY_BASE
+            bottom_score = BOTTOM_ROYALTY[bottom_category]
+            if bottom_category >= QUADS:
+                bottom_score += self.reentry_bonus
+
+            # Нижняя линия отсортирована по убыванию, поэтому дальше граница только меньше
+            if bottom_score + MIDDLE_ROYALTY[bottom_category] + top_scores[0] <= best_score:
+                break
+
+            for m in range(bisect_left(five_keys, -bottom_strength), len(fives)):
+                # Время проверяется по всем шагам перебора, а не только по найденным
+                # раскладкам; без найденной раскладки поиск не прерывается
+                steps += 1
+                if steps % 64 == 0 and best_layout is not None and time.perf_counter() > deadline:
+                    complete = False
+                    break
+
+                middle_strength, middle_mask, middle = fives[m]
+                if middle_mask & bottom_mask:
+                    continue
+
+                t = bisect_left(top_keys, -middle_strength)
+                if t == len(tops):
+                    break
+                middle_score = MIDDLE_ROYALTY[middle_strength // CATEGORY_BASE]
+                if bottom_score + middle_score + top_scores[t] <= best_score:
+                    break
+
+                # Ценность верхней линии не убывает с её силой: берём первую подходящую
+                used_mask = bottom_mask | middle_mask
+                while t < len(tops) and tops[t][1] & used_mask:
+                    t += 1
+                if t == len(tops):
+                    continue
+
+                layouts += 1
+                score = bottom_score + middle_score + top_scores[t]
+                if bottom_category >= QUADS and tops[t][0] // CATEGORY_BASE == TRIPS:
+                    score -= self.reentry_bonus  # Повторная фантазия засчитывается один раз
+                if score > best_score:
+                    best_score = score
+                    best_layout = (tops[t][2], middle, bottom)
+            if not complete:
+                break
+
+        if stats is not None:
+            stats.update({
+                'layouts': layouts,
+                'steps': steps,
+                'complete': complete,
+                'elapsed': time.perf_counter() - started,
+                'score': best_score
+            })
+
+        if best_layout is None:
+            return None
+        top, middle, bottom = best_layout
+        placed = set(top) | set(middle) | set(bottom)
+        return {
+            'top': list(top),
+            'middle': list(middle),
+            'bottom': list(bottom),
+            'discard': [card for card in cards if card not in placed]
+        }
+
+    def _top_score(self, strength: int) -> float:
+        """Бонусы верхней линии с учетом повторной фантазии (сет)"""
+        score = top_royalty(strength)
+        if strength // CATEGORY_BASE == TRIPS:
+            score += self.reentry_bonus
+        return score
+
+    def _sorted_lines(self, cards: List[int], size: int, evaluate) -> List[Tuple[int, int, Tuple[int, ...]]]:
+        """Все неупорядоченные линии заданного размера по убыванию силы"""
+        lines = []
+        for line in combinations(cards, size):
+            mask = 0
+            for card in line:
+                mask |= CARD_BIT[card]
+            lines.append((evaluate(list(line)), mask, line))
+        lines.sort(key=lambda item: item[0], reverse=True)
+        return lines
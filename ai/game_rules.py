@@ -1,12 +1,16 @@
 # ai/game_rules.py
 from typing import List, Dict
-from .evaluator import HandEvaluator
+from .evaluator import HandEvaluator, PAIR, TRIPS, STRAIGHT
+from .cards import RANKS, RANK_OF
 
 class PineappleRules:
+    # Бонусы за пару на верхней линии по индексу ранга (66 = 1 ... AA = 9)
+    TOP_PAIR_ROYALTY = (0, 0, 0, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9)
+
     def __init__(self):
         self.evaluator = HandEvaluator()
         
-    def is_valid_hand(self, top: List[Dict], middle: List[Dict], bottom: List[Dict]) -> bool:
+    def is_valid_hand(self, top: List[int], middle: List[int], bottom: List[int]) -> bool:
         """Проверяет валидность всей руки"""
         if len(top) != 3 or len(middle) != 5 or len(bottom) != 5:
             return False
@@ -18,29 +22,28 @@ class PineappleRules:
         
         return top_value <= middle_value <= bottom_value
         
-    def check_fantasy(self, top_cards: List[Dict]) -> Dict:
+    def check_fantasy(self, top_cards: List[int]) -> Dict:
         """Проверяет возможность фантазии и определяет тип"""
         if not top_cards or len(top_cards) != 3:
             return {'fantasy': False, 'type': None, 'extra_cards': 0}
             
-        ranks = [card['rank'] for card in top_cards]
-        rank_counts = {}
-        for rank in ranks:
-            rank_counts[rank] = rank_counts.get(rank, 0) + 1
-            
+        rank_counts = [0] * 13
+        for card in top_cards:
+            rank_counts[RANK_OF[card]] += 1
+
         # Проверяем условия фантазии
-        if rank_counts.get('Q', 0) >= 2:
+        if rank_counts[10] >= 2:
             return {'fantasy': True, 'type': 'QQ', 'extra_cards': 14}
-        if rank_counts.get('K', 0) >= 2:
+        if rank_counts[11] >= 2:
             return {'fantasy': True, 'type': 'KK', 'extra_cards': 15}
-        if rank_counts.get('A', 0) >= 2:
+        if rank_counts[12] >= 2:
             return {'fantasy': True, 'type': 'AA', 'extra_cards': 16}
-            
+
         # Проверяем сеты
-        for rank in '23456789TJQKA':
-            if rank_counts.get(rank, 0) >= 3:
-                return {'fantasy': True, 'type': f'Set of {rank}', 'extra_cards': 17}
-                
+        for rank in range(13):
+            if rank_counts[rank] >= 3:
+                return {'fantasy': True, 'type': f'Set of {RANKS[rank]}', 'extra_cards': 17}
+
         return {'fantasy': False, 'type': None, 'extra_cards': 0}
         
     def calculate_score(self, hand1: Dict, hand2: Dict) -> int:
@@ -71,35 +74,31 @@ class PineappleRules:
         
         # Бонусы за верхнюю линию
         top_value = self.evaluator.evaluate_top(hand['top'])
-        if top_value >= 10:  # Сет
+        if self.evaluator.category(top_value) >= PAIR:  # От пары 66 и выше
             royalties['top'] = self._get_top_royalty(hand['top'])
             
         # Бонусы за среднюю линию
         middle_value = self.evaluator.evaluate_middle(hand['middle'])
-        if middle_value >= 3000:  # От сета и выше
-            royalties['middle'] = self._get_middle_royalty(hand['middle'])
+        if self.evaluator.category(middle_value) >= TRIPS:  # От сета и выше
+            royalties['middle'] = self.evaluator._get_middle_royalty(hand['middle'])
             
         # Бонусы за нижнюю линию
         bottom_value = self.evaluator.evaluate_bottom(hand['bottom'])
-        if bottom_value >= 4000:  # От стрита и выше
-            royalties['bottom'] = self._get_bottom_royalty(hand['bottom'])
+        if self.evaluator.category(bottom_value) >= STRAIGHT:  # От стрита и выше
+            royalties['bottom'] = self.evaluator._get_bottom_royalty(hand['bottom'])
             
         return royalties
         
-    def _get_top_royalty(self, cards: List[Dict]) -> int:
+    def _get_top_royalty(self, cards: List[int]) -> int:
         """Подсчитывает бонусы за верхнюю линию"""
-        ranks = [card['rank'] for card in cards]
-        rank_counts = {}
-        for rank in ranks:
-            rank_counts[rank] = rank_counts.get(rank, 0) + 1
-            
+        rank_counts = [0] * 13
+        for card in cards:
+            rank_counts[RANK_OF[card]] += 1
+
         # Проверяем пары и сеты
-        for rank in 'AKQJT98765432':
-            if rank_counts.get(rank, 0) == 2:
-                return {'A': 9, 'K': 8, 'Q': 7, 'J': 6, 'T': 5,
-                       '9': 4, '8': 3, '7': 2, '6': 1}.get(rank, 0)
-            elif rank_counts.get(rank, 0) == 3:
-                return {'A': 22, 'K': 21, 'Q': 20, 'J': 19, 'T': 18,
-                       '9': 17, '8': 16, '7': 15, '6': 14, '5': 13,
-                       '4': 12, '3': 11, '2': 10}.get(rank, 0)
+        for rank in range(12, -1, -1):
+            if rank_counts[rank] == 2:
+                return self.TOP_PAIR_ROYALTY[rank]
+            elif rank_counts[rank] == 3:
+                return 10 + rank
         return 0
@@ -0,0 +1,127 @@
+# ai/game_state.py
+from typing import List, Dict, Optional, Sequence, Tuple
+from .cards import NUM_CARDS, FULL_MASK, cards_mask, mask_to_cards, cards_from_json, cards_to_json
+from .isomorphism import LINES, LINE_SIZES
+
+class GameState:
+    """
+    Изменяемое состояние раздачи одного игрока
+
+    Обход дерева не копирует состояние: make_move и deal меняют его на месте
+    и запоминают минимум для отката, unmake_move отменяет последнее изменение.
+    Линии хранятся списками карт (их читают правила, оценщик и абстракции),
+    колода - маской еще не виденных карт.
+    """
+
+    __slots__ = ('table', 'hand', 'visible_cards', 'deck_mask',
+                 'placed', 'fantasy_mode', 'progressive', '_history')
+
+    def __init__(self, fantasy_mode: bool = False, progressive: bool = False):
+        self.table: Dict[str, List[int]] = {line: [] for line in LINES}
+        self.hand: List[int] = []
+        self.visible_cards: List[int] = []  # Сброшенные и открытые карты соперников
+        self.deck_mask = FULL_MASK
+        self.placed = 0
+        self.fantasy_mode = fantasy_mode
+        self.progressive = progressive
+        # Записи отката: (действие или None для раздачи, рука до изменения, маска колоды)
+        self._history: List[Tuple[Optional[Dict], List[int], int]] = []
+
+    @classmethod
+    def from_cards(cls, table: Dict[str, Sequence[int]], hand: Sequence[int] = (),
+                   visible_cards: Sequence[int] = (), fantasy_mode: bool = False,
+                   progressive: bool = False) -> 'GameState':
+        """Создает состояние по целым картам; колода - все остальные карты"""
+        state = cls(fantasy_mode, progressive)
+        for line in LINES:
+            cards = list(table.get(line, ()))
+            if len(cards) > LINE_SIZES[line]:
+                raise ValueError(f"Too many cards in line {line}")
+            state.table[line] = cards
+            state.placed += len(cards)
+        state.hand = list(hand)
+        state.visible_cards = list(visible_cards)
+        known = [card for line in LINES for card in state.table[line]] + state.hand + state.visible_cards
+        known_mask = cards_mask(known)
+        if bin(known_mask).count('1') != len(known):
+            raise ValueError("Duplicate cards in game state")
+        state.deck_mask = FULL_MASK & ~known_mask
+        return state
+
+    @classmethod
+    def from_json(cls, game_state: Dict) -> 'GameState':
+        """Создает состояние из JSON game_state (пустые слоты линий пропускаются)"""
+        table = game_state.get('table', {})
+        return cls.from_cards({line: cards_from_json(table.get(line, [])) for line in LINES},
+                              cards_from_json(game_state.get('hand', [])),
+                              cards_from_json(game_state.get('visible_cards', [])),
+                              bool(game_state.get('fantasy_mode')),
+                              bool(game_state.get('progressive')))
+
+    def to_json(self) -> Dict:
+        """JSON game_state: карты-словари, линии дополнены пустыми слотами"""
+        return {
+            'hand': cards_to_json(self.hand),
+            'table': {line: cards_to_json(self.table[line]) + [''] * (LINE_SIZES[line] - len(self.table[line]))
+                      for line in LINES},
+            'visible_cards': cards_to_json(self.visible_cards),
+            'fantasy_mode': self.fantasy_mode,
+            'progressive': self.progressive
+        }
+
+    @property
+    def is_complete(self) -> bool:
+        """Все 13 мест заняты"""
+        return self.placed == 13
+
+    def free_slots(self) -> List[int]:
+        """Свободные места в top, middle, bottom"""
+        return [LINE_SIZES[line] - len(self.table[line]) for line in LINES]
+
+    def deck_cards(self) -> List[int]:
+        """Карты, которые еще могут прийти"""
+        return mask_to_cards(self.deck_mask)
+
+    def sample_deck(self, rng, count: int) -> List[int]:
+        """Случайные карты колоды без повторов (выборка с отбраковкой по маске)"""
+        mask = self.deck_mask
+        if bin(mask).count('1') < 2 * count:
+            return rng.sample(mask_to_cards(mask), min(count, bin(mask).count('1')))
+        cards = []
+        while len(cards) < count:
+            card = rng.randrange(NUM_CARDS)
+            if mask >> card & 1:
+                cards.append(card)
+                mask ^= 1 << card
+        return cards
+
+    def deal(self, cards: Sequence[int]) -> None:
+        """Раздает карты на руку из колоды"""
+        self._history.append((None, self.hand, self.deck_mask))
+        self.hand = list(cards)
+        self.deck_mask &= ~cards_mask(cards)
+
+    def make_move(self, action: Dict) -> None:
+        """Размещает карты действия по линиям, сброшенные становятся видимыми"""
+        self._history.append((action, self.hand, self.deck_mask))
+        for line in LINES:
+            cards = action.get(line)
+            if cards:
+                self.table[line].extend(cards)
+                self.placed += len(cards)
+        if action.get('discard'):
+            self.visible_cards.extend(action['discard'])
+        self.hand = []
+
+    def unmake_move(self) -> None:
+        """Отменяет последний make_move или deal"""
+        action, self.hand, self.deck_mask = self._history.pop()
+        if action is None:
+            return
+        for line in LINES:
+            cards = action.get(line)
+            if cards:
+                del self.table[line][-len(cards):]
+                self.placed -= len(cards)
+        if action.get('discard'):
+            del self.visible_cards[-len(action['discard']):]
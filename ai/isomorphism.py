@@ -0,0 +1,65 @@
+# ai/isomorphism.py
+from typing import List, Dict, Sequence, Tuple
+from itertools import permutations, product
+from .cards import NUM_CARDS, SUIT_OF, RANK_BIT
+
+LINES = ('top', 'middle', 'bottom')
+LINE_SIZES = {'top': 3, 'middle': 5, 'bottom': 5}
+ACTION_LINES = LINES + ('discard',)
+
+SuitMap = Tuple[int, ...]
+
+def suit_profiles(groups: Sequence[Sequence[int]]) -> List[Tuple[int, ...]]:
+    """
+    Профиль масти: маски рангов этой масти в каждой группе карт
+
+    Две масти взаимозаменяемы тогда и только тогда, когда их профили совпадают.
+    """
+    profiles = [[0] * len(groups) for _ in range(4)]
+    for g, cards in enumerate(groups):
+        for card in cards:
+            profiles[SUIT_OF[card]][g] |= RANK_BIT[card]
+    return [tuple(profile) for profile in profiles]
+
+def canonical_suit_map(groups: Sequence[Sequence[int]]) -> SuitMap:
+    """Перенумерация мастей в канонический порядок (по убыванию профилей)"""
+    profiles = suit_profiles(groups)
+    order = sorted(range(4), key=lambda s: profiles[s], reverse=True)
+    mapping = [0] * 4
+    for new_suit, old_suit in enumerate(order):
+        mapping[old_suit] = new_suit
+    return tuple(mapping)
+
+def relabel(cards: Sequence[int], mapping: SuitMap) -> List[int]:
+    """Применяет перенумерацию мастей к списку карт"""
+    return [(card & ~3) | mapping[card & 3] for card in cards]
+
+def canonicalize(groups: Sequence[Sequence[int]]) -> List[List[int]]:
+    """Каноническая форма групп карт: перенумерованные масти, группы отсортированы"""
+    mapping = canonical_suit_map(groups)
+    return [sorted(relabel(cards, mapping)) for cards in groups]
+
+def suit_automorphisms(groups: Sequence[Sequence[int]]) -> List[SuitMap]:
+    """Все перестановки мастей, переводящие группы карт сами в себя"""
+    profiles = suit_profiles(groups)
+    classes: Dict[Tuple[int, ...], List[int]] = {}
+    for suit, profile in enumerate(profiles):
+        classes.setdefault(profile, []).append(suit)
+    classes = [suits for suits in classes.values() if len(suits) > 1]
+    if not classes:
+        return [(0, 1, 2, 3)]
+
+    # Перестановки внутри каждого класса одинаковых профилей
+    automorphisms = []
+    for choice in product(*(permutations(suits) for suits in classes)):
+        mapping = [0, 1, 2, 3]
+        for suits, permuted in zip(classes, choice):
+            for old_suit, new_suit in zip(suits, permuted):
+                mapping[old_suit] = new_suit
+        automorphisms.append(tuple(mapping))
+    return automorphisms
+
+def automorphism_tables(groups: Sequence[Sequence[int]]) -> List[List[int]]:
+    """Таблицы перенумерации всех 52 карт для каждой симметрии мастей групп"""
+    return [[(card & ~3) | mapping[card & 3] for card in range(NUM_CARDS)]
+            for mapping in suit_automorphisms(groups)]
@@ -0,0 +1,80 @@
+# ai/key_index.py
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+class LazyKeyIndex:
+    """
+    Индекс ключ -> строка поверх отображенного в память блока ключей
+
+    Вместо построения словаря на все наборы при загрузке ключ ищется
+    двоичным поиском по отсортированному порядку строк; читаются только
+    затронутые страницы файла. Найденные и новые ключи хранятся в словаре.
+    Порядок байтов UTF-8 совпадает с порядком строк Python, поэтому
+    сортировка при сохранении по str согласована с поиском по bytes.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, order: np.ndarray):
+        # memoryview тех же страниц: индексация и срезы memmap заметно медленнее
+        self.blob = memoryview(blob.view(np.ndarray))        # Ключи подряд (uint8)
+        self.offsets = memoryview(offsets.view(np.ndarray))  # Ключ строки i - байты offsets[i]:offsets[i + 1] - 1
+        self.order = memoryview(order.view(np.ndarray))      # Строки в порядке возрастания ключей
+        self.size = len(order)
+        self.found: Dict[str, int] = {}  # Кэш найденных ключей базы
+        self.added: Dict[str, int] = {}  # Ключи, добавленные после загрузки
+
+    def _key_bytes(self, row: int) -> bytes:
+        return bytes(self.blob[self.offsets[row]:self.offsets[row + 1] - 1])
+
+    def _search(self, key: str) -> int:
+        target = key.encode()
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_bytes(self.order[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.size:
+            row = int(self.order[lo])
+            if self._key_bytes(row) == target:
+                return row
+        return -1
+
+    def get(self, key: str, default: Optional[int] = None) -> Optional[int]:
+        row = self.added.get(key)
+        if row is None:
+            row = self.found.get(key)
+        if row is None:
+            row = self._search(key)
+            if row < 0:
+                return default
+            self.found[key] = row
+        return row
+
+    def __getitem__(self, key: str) -> int:
+        row = self.get(key)
+        if row is None:
+            raise KeyError(key)
+        return row
+
+    def __setitem__(self, key: str, row: int) -> None:
+        self.added[key] = row
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return self.size + len(self.added)
+
+    def keys(self) -> Iterator[str]:
+        for key, _ in self.items():
+            yield key
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        """Все пары (читает весь блок ключей)"""
+        base_keys: List[str] = self.blob.tobytes().decode().split('\n') if self.size else []
+        yield from zip(base_keys, range(self.size))
+        yield from self.added.items()
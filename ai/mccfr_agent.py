@@ -1,487 +1,605 @@
 # ai/mccfr_agent.py
-from typing import List, Dict, Set, Tuple
+from typing import List, Dict, Tuple, Optional, Union, BinaryIO, Sequence
+import random
+import threading
+import time
 import numpy as np
-import json
 from .game_rules import PineappleRules
 from .evaluator import HandEvaluator
+from .fantasy_solver import FantasySolver
+from .strategy_store import StrategyStore, DEFAULT_MAX_BYTES
+from .checkpoint import save_checkpoint, dumps_checkpoint, load_checkpoint
+from .policy import Policy, export_policy
+from .abstraction import make_abstraction
+from .isomorphism import LINES, canonical_suit_map
+from .moves import MoveList, generate_moves
+from .game_state import GameState
+from .rollout import RolloutEngine
+from .transposition import TranspositionCache, zobrist_hash
+from .cards import cards_to_json
+
+MAX_ROYALTIES = 97  # 22 (top) + 50 (middle) + 25 (bottom)
 
 class MCCFRAgent:
-    def __init__(self, progressive: bool = False):
+    # Режимы тренировки: внешняя выборка (с пробами) и выборка исходов
+    TRAINING_MODES = ('external', 'outcome')
+
+    def __init__(self, progressive: bool = False, max_table_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+                 abstraction: str = 'pattern'):
         self.progressive = progressive
         self.rules = PineappleRules()
         self.evaluator = HandEvaluator()
-        
+        self.abstraction = make_abstraction(abstraction)
+        self.rng = random.Random()
+
         # Стратегии и счетчики
-        self.strategy_map = {}
-        self.regret_sum = {}
-        self.strategy_sum = {}
-        
-        # Информация о картах
-        self.cards_info = {
-            'remaining': set(range(52)),
-            'visible': set(),
-            'fantasy_potential': 0.0
-        }
-        
+        self.store = StrategyStore(max_bytes=max_table_bytes)
+        self.iterations = 0
+        # Тренировка, слияние приращений, снимки и экспорт таблиц идут по очереди:
+        # иначе снимок может пропустить строки, измененные во время его записи
+        self.lock = threading.RLock()
+
+        # Замороженный агент только играет по средней стратегии и не меняет таблицы
+        self.frozen = False
+        self.policy: Optional[Policy] = None  # Экспортированная политика для игры
+
         # Веса для оценки стратегий
         self.weights = {
             'fantasy': 2.0,    # Вес для достижения фантазии
             'royalty': 1.5,    # Вес для получения бонусов
             'winning': 1.0     # Вес для победы в линиях
         }
-        
-    def get_action(self, game_state: Dict) -> Dict:
-        """Выбирает лучший ход в текущей ситуации"""
-        if game_state.get('fantasy_mode'):
-            return self._get_fantasy_action(game_state)
-        return self._get_regular_action(game_state)
-        
-    def _get_fantasy_action(self, game_state: Dict) -> Dict:
+
+        # Параметры тренировки
+        self.exploration = 0.6     # Доля равномерного исследования в outcome sampling
+        self.foul_penalty = 6.0    # Штраф за мертвую руку (проигрыш всех линий)
+        self.fantasy_bonus = 15.0  # Ожидаемая ценность попадания в фантазию
+
+        # Поиск раскладки в фантазии
+        self.fantasy_time_budget = 2.0  # Лимит времени на ход в фантазии (сек)
+        self.fantasy_solver = FantasySolver(time_budget=self.fantasy_time_budget)
+
+        # Оценка кандидатов хода доигровками; кэши живут, пока жив агент,
+        # то есть между запросами в одном рабочем процессе
+        self.rollout = RolloutEngine(foul_penalty=self.foul_penalty, fantasy_bonus=self.fantasy_bonus,
+                                     cache=TranspositionCache())
+        self.terminal_cache = TranspositionCache()
+
+    def get_action(self, game_state: Dict, seed: Optional[int] = None,
+                   time_budget: Optional[float] = None, stats: Optional[Dict] = None) -> Dict:
+        """
+        Выбирает лучший ход в текущей ситуации
+
+        Поиск прерываемый: доигровки добавляются раундами, а перебор раскладок
+        фантазии идет от сильнейших нижних линий, поэтому по истечении лимита
+        возвращается лучший найденный ход. Минимальная оценка (первый раунд
+        доигровок всех кандидатов, первая раскладка фантазии) выполняется при
+        любом лимите.
+
+        Args:
+            game_state: JSON game_state
+            seed: Зерно доигровок
+            time_budget: Лимит времени на ход в секундах (по умолчанию - лимиты
+                self.rollout и self.fantasy_time_budget)
+            stats: Словарь, в который записывается объем поиска: 'mode',
+                'candidates', 'samples', 'complete', 'elapsed'
+
+        Raises:
+            ValueError: В состоянии нет допустимого хода
+        """
+        started = time.perf_counter()
+        state = GameState.from_json(game_state)
+        search: Dict = {}
+        if state.fantasy_mode:
+            action = self._get_fantasy_action(state, time_budget, search)
+        else:
+            action = self._get_regular_action(state, seed, time_budget, search)
+        if stats is not None:
+            stats.update(self._search_stats(state.fantasy_mode, search))
+            stats['elapsed'] = time.perf_counter() - started
+        return self._action_to_json(action)
+
+    def get_actions(self, game_states: Sequence[Dict], seed: Optional[int] = None,
+                    time_budget: Optional[float] = None, stats: Optional[Dict] = None,
+                    errors: Optional[Dict[int, str]] = None) -> List[Optional[Dict]]:
+        """
+        Выбирает ходы сразу для нескольких состояний (например, столов)
+
+        Ходы те же, что у get_action, но кандидаты всех обычных состояний
+        оцениваются одной пакетной доигровкой (общие раздачи и кэши, один вызов
+        оценщика на раунд). Фантазии решаются по отдельности, каждая - в своей
+        доле оставшегося лимита; доигровкам достается остаток.
+
+        Args:
+            game_states: JSON game_state каждого стола
+            seed: Зерно доигровок
+            time_budget: Лимит времени на весь пакет в секундах
+            stats: Словарь для суммарного объема поиска (как у get_action)
+            errors: Если задан, ошибки отдельных состояний записываются в него
+                (индекс -> сообщение), а их ходы равны None; иначе ошибка
+                любого состояния прерывает весь пакет
+        """
+        started = time.perf_counter()
+        actions: List[Optional[Dict]] = [None] * len(game_states)
+        totals = {'candidates': 0, 'samples': 0, 'complete': True}
+
+        def fail(i: int, error: Exception) -> None:
+            if errors is None:
+                raise error
+            errors[i] = str(error)
+
+        fantasies = []
+        regular = []
+        for i, game_state in enumerate(game_states):
+            try:
+                state = GameState.from_json(game_state)
+                if state.fantasy_mode:
+                    fantasies.append((i, state))
+                    continue
+                legal_actions = self._get_legal_actions(state) if state.hand else []
+                if not legal_actions:
+                    raise ValueError("No legal moves in this state")
+                regular.append((i, state, legal_actions, self._get_play_strategy(state, len(legal_actions))))
+            except (KeyError, TypeError, ValueError) as e:
+                fail(i, e)
+
+        for n, (i, state) in enumerate(fantasies):
+            budget = None
+            if time_budget is not None:
+                shares = len(fantasies) - n + (1 if regular else 0)
+                budget = max(time_budget - (time.perf_counter() - started), 0.0) / shares
+            search: Dict = {}
+            try:
+                actions[i] = self._get_fantasy_action(state, budget, search)
+            except (KeyError, TypeError, ValueError) as e:
+                fail(i, e)
+                continue
+            self._add_search_stats(totals, self._search_stats(True, search))
+
+        if regular:
+            budget = None
+            if time_budget is not None:
+                budget = max(time_budget - (time.perf_counter() - started), 0.0)
+            search = {}
+            try:
+                rollouts = self.rollout.evaluate_positions(
+                    [(state, legal_actions) for _, state, legal_actions, _ in regular],
+                    seed=seed, time_budget=budget, stats=search)
+            except (KeyError, TypeError, ValueError, IndexError):
+                if errors is None:
+                    raise
+                # Пакет прервало одно из состояний: оцениваем их по отдельности,
+                # чтобы ошибка досталась только ему
+                share = budget / len(regular) if budget is not None else None
+                search = {'candidates': 0, 'cached': 0, 'samples': 0, 'rounds': 0, 'complete': True}
+                rollouts = []
+                for i, state, legal_actions, _ in regular:
+                    single: Dict = {}
+                    try:
+                        rollouts.append(self._evaluate_winning_chances(state, legal_actions, seed, share, single))
+                    except (KeyError, TypeError, ValueError, IndexError) as e:
+                        fail(i, e)
+                        rollouts.append(None)
+                        continue
+                    for key in ('candidates', 'cached', 'samples', 'rounds'):
+                        search[key] += single[key]
+                    search['complete'] = search['complete'] and single['complete']
+            for (i, _, legal_actions, strategy), results in zip(regular, rollouts):
+                if results is not None:
+                    actions[i] = self._select_action(legal_actions, strategy, results)
+            self._add_search_stats(totals, self._search_stats(False, search))
+
+        if stats is not None:
+            stats.update(totals)
+            stats['elapsed'] = time.perf_counter() - started
+        return [self._action_to_json(action) for action in actions]
+
+    def _search_stats(self, fantasy: bool, search: Dict) -> Dict:
+        """Объем поиска хода по статистике решателя фантазии или доигровок"""
+        if fantasy:
+            return {
+                'mode': 'fantasy',
+                'candidates': search['layouts'],
+                'samples': 0,
+                'complete': search['complete']
+            }
+        return {
+            'mode': 'regular',
+            'candidates': search['candidates'],
+            'cached': search['cached'],
+            'samples': search['samples'],
+            'rounds': search['rounds'],
+            'complete': search['complete']
+        }
+
+    def _add_search_stats(self, totals: Dict, search: Dict) -> None:
+        totals['candidates'] += search['candidates']
+        totals['samples'] += search['samples']
+        totals['complete'] = totals['complete'] and search['complete']
+
+    def save_state(self, target: Optional[Union[str, BinaryIO]] = None,
+                   compress: bool = False, delta: bool = False) -> Optional[bytes]:
+        """
+        Сохраняет состояние агента в бинарную контрольную точку
+
+        После сохранения отметки измененных строк сбрасываются, поэтому
+        следующая дельта содержит только изменения после этого сохранения.
+
+        Args:
+            target: Путь или бинарный файл; если не задан, возвращаются байты
+            compress: Сжимать ли массивы (такой файл не отображается в память)
+            delta: Сохранить только строки, измененные с прошлого сохранения
+        """
+        with self.lock:
+            meta = {
+                'format': 'mccfr-agent',
+                'kind': 'delta' if delta else 'base',
+                'progressive': self.progressive,
+                'iterations': self.iterations,
+                'abstraction': self.abstraction.name,
+                'weights': self.weights
+            }
+            arrays = self.store.to_arrays(changed_only=delta)
+            if target is None:
+                data = dumps_checkpoint(meta, arrays, compress)
+            else:
+                save_checkpoint(target, meta, arrays, compress)
+                data = None
+            self.store.clear_dirty()
+        return data
+
+    def load_state(self, source: Union[str, bytes, Dict, List], mmap: bool = True) -> None:
+        """
+        Загружает состояние агента
+
+        Args:
+            source: Путь или байты контрольной точки save_state; список из базовой
+                    точки и дельт (применяются по порядку); либо словарь старого
+                    JSON-формата
+            mmap: Отображать массивы базовой точки в память вместо чтения
+        """
+        deltas = []
+        if isinstance(source, list):
+            source, deltas = source[0], source[1:]
+
+        if isinstance(source, dict):
+            meta = source
+            store = StrategyStore.from_dict(source['store'], max_bytes=self.store.max_bytes) \
+                if 'store' in source else self.store
+        else:
+            meta, arrays = load_checkpoint(source, mmap=mmap)
+            store = StrategyStore.from_arrays(arrays, max_bytes=self.store.max_bytes)
+
+        for delta in deltas:
+            meta, arrays = load_checkpoint(delta, mmap=False)
+            store.apply_arrays(arrays)
+        store.clear_dirty()
+
+        with self.lock:
+            self.iterations = meta.get('iterations', 0)
+            self.abstraction = make_abstraction(meta.get('abstraction', 'exact'))
+            self.weights.update(meta.get('weights', {}))
+            self.store = store
+            self.terminal_cache.clear()  # Ценности зависят от весов
+
+    def export_policy(self, target: Optional[Union[str, BinaryIO]] = None,
+                      prune_threshold: float = 0.01) -> Optional[bytes]:
+        """Экспортирует квантованную среднюю стратегию (см. ai.policy)"""
+        with self.lock:
+            meta = {
+                'progressive': self.progressive,
+                'iterations': self.iterations,
+                'abstraction': self.abstraction.name
+            }
+            return export_policy(self.store, target, meta, prune_threshold)
+
+    def merge(self, delta: Dict, iterations: int) -> None:
+        """Добавляет приращения таблиц, посчитанные рабочим процессом (см. StrategyStore.diff)"""
+        with self.lock:
+            self.store.merge(delta)
+            self.iterations += iterations
+
+    def load_policy(self, source: Union[str, bytes]) -> None:
+        """Загружает политику: ходы выбираются по ней вместо таблиц сожалений"""
+        self.policy = Policy.load(source)
+        self.abstraction = make_abstraction(self.policy.meta.get('abstraction', self.abstraction.name))
+
+    def freeze(self) -> None:
+        """
+        Переводит агента в режим только для чтения
+
+        Ходы выбираются по средней стратегии, тренировка запрещена. Знания о
+        картах берутся только из состояния запроса, поэтому один агент может
+        обслуживать любые запросы (и разделяться процессами после fork).
+        """
+        self.frozen = True
+
+    def _action_to_json(self, action):
+        """Преобразует действие с целочисленными картами обратно в JSON"""
+        if not isinstance(action, dict):
+            return action
+        return {line: cards_to_json(cards) if isinstance(cards, list) else cards
+                for line, cards in action.items()}
+
+    def _get_fantasy_action(self, game_state: GameState, time_budget: Optional[float] = None,
+                            stats: Optional[Dict] = None) -> Dict:
         """Логика для режима фантазии"""
-        available_cards = self._get_available_cards(game_state)
-        possible_hands = self._generate_possible_hands(
-            available_cards,
-            extra_cards=self._get_fantasy_cards_count(game_state)
-        )
-        
-        best_hand = None
-        best_value = float('-inf')
-        
-        for hand in possible_hands:
-            value = self._evaluate_fantasy_hand(hand)
-            if value > best_value and self.rules.is_valid_hand(**hand):
-                best_value = value
-                best_hand = hand
-                
-        return best_hand
-        
-    def _get_regular_action(self, game_state: Dict) -> Dict:
+        budget = self.fantasy_time_budget if time_budget is None else time_budget
+        action = self.fantasy_solver.solve(game_state.hand, budget, stats)
+        if action is None:
+            raise ValueError("Fantasy hand must have at least 13 cards")
+        return action
+
+    def _get_regular_action(self, game_state: GameState, seed: Optional[int] = None,
+                            time_budget: Optional[float] = None, stats: Optional[Dict] = None) -> Dict:
         """Логика для обычного режима"""
-        info_set = self._get_information_set(game_state)
-        strategy = self._get_strategy(info_set)
-        
+        started = time.perf_counter()
         # Получаем возможные действия
-        legal_actions = self._get_legal_actions(game_state)
-        
-        # Оцениваем каждое действие
+        legal_actions = self._get_legal_actions(game_state) if game_state.hand else []
+        if not legal_actions:
+            raise ValueError("No legal moves in this state")
+        strategy = self._get_play_strategy(game_state, len(legal_actions))
+
+        # На доигровки остается лимит за вычетом генерации ходов
+        if time_budget is not None:
+            time_budget = max(time_budget - (time.perf_counter() - started), 0.0)
+        rollouts = self._evaluate_winning_chances(game_state, legal_actions, seed, time_budget, stats)
+        return self._select_action(legal_actions, strategy, rollouts)
+
+    def _get_play_strategy(self, game_state: GameState, num_actions: int) -> np.ndarray:
+        """Стратегия для игры: экспортированная политика, средняя (у замороженного агента) или текущая"""
+        info_set = self._get_information_set(game_state, num_actions)
+        strategy = self.policy.strategy(info_set, num_actions) if self.policy else None
+        if strategy is None:
+            row = self.store.lookup(info_set)
+            if self.frozen and row >= 0:
+                strategy = self.store.average_strategy(row)
+            else:
+                strategy = self._get_strategy(row, num_actions)
+        return strategy
+
+    def _select_action(self, legal_actions: Sequence[Dict], strategy: np.ndarray,
+                       rollouts: List[Dict]) -> Dict:
+        """Выбирает лучшее действие по стратегии и итогам доигровок"""
+        # Оцениваем каждое действие: фантазия, бонусы и риск мертвой руки -
+        # по доигровкам из оставшейся колоды
         action_values = []
-        for action in legal_actions:
-            base_value = strategy.get(str(action), 1.0)
-            fantasy_value = self._evaluate_fantasy_potential(action)
-            royalty_value = self._evaluate_royalties(action)
-            winning_value = self._evaluate_winning_chances(action, game_state)
-            
+        for i, action in enumerate(legal_actions):
+            base_value = strategy[i]
+            fantasy_value = rollouts[i]['fantasy']
+            royalty_value = rollouts[i]['royalties'] / MAX_ROYALTIES
+            winning_value = rollouts[i]['strength'] - rollouts[i]['foul']
+
             total_value = (
                 base_value +
                 self.weights['fantasy'] * fantasy_value +
                 self.weights['royalty'] * royalty_value +
                 self.weights['winning'] * winning_value
             )
-            
+
             action_values.append((action, total_value))
-            
+
         # Выбираем лучшее действие
         return max(action_values, key=lambda x: x[1])[0]
-        
-    def train(self, iterations: int = 1000):
-        """Тренировка агента"""
+
+    def train(self, iterations: int = 1000, mode: str = 'outcome'):
+        """
+        Тренировка агента методом Monte Carlo CFR
+
+        Args:
+            iterations: Количество итераций (одна сыгранная раздача на итерацию)
+            mode: 'outcome' - одна траектория с выборкой и своих действий, и раздачи;
+                  'external' - перебор своих действий в узлах траектории, где
+                  каждое несыгранное действие оценивается одной пробной доигровкой
+        """
+        if mode not in self.TRAINING_MODES:
+            raise ValueError(f"Unknown training mode: {mode}")
+        if self.frozen:
+            raise RuntimeError("Cannot train a frozen agent")
+
+        # Блокировка берется на каждую итерацию, чтобы сохранения не ждали всю тренировку
         for _ in range(iterations):
-            game_state = self._create_training_state()
-            utility = self._cfr_iteration(game_state, 1.0)
-            
-            # Обновляем веса на основе результатов
-            self._update_weights(utility)
-            
-    def _cfr_iteration(self, game_state: Dict, reach_probability: float) -> float:
-        """Одна итерация CFR"""
-        if self._is_terminal(game_state):
-            return self._get_utility(game_state)
-            
-        info_set = self._get_information_set(game_state)
-        strategy = self._get_strategy(info_set)
-        
-        # Вычисляем значения действий
-        action_utilities = {}
-        node_utility = 0
-        
-        for action in self._get_legal_actions(game_state):
-            new_state = self._apply_action(game_state, action)
-            action_utility = self._cfr_iteration(new_state, 
-                                              reach_probability * strategy[str(action)])
-            action_utilities[str(action)] = action_utility
-            node_utility += strategy[str(action)] * action_utility
-            
-        # Обновляем сожаления и стратегию
-        for action in action_utilities:
-            regret = action_utilities[action] - node_utility
-            self.regret_sum[info_set][action] += reach_probability * regret
-            self.strategy_sum[info_set][action] += reach_probability * strategy[action]
-            
-        return node_utility
-        
-    def _get_strategy(self, info_set: str) -> Dict[str, float]:
-        """Получает текущую стратегию для информационного набора"""
-        if info_set not in self.strategy_map:
-            self.strategy_map[info_set] = {}
-            self.regret_sum[info_set] = {}
-            self.strategy_sum[info_set] = {}
-            
-        # Нормализуем сожаления
-        regret_sum = self.regret_sum[info_set]
-        positive_regrets = {a: max(r, 0) for a, r in regret_sum.items()}
-        regret_sum = sum(positive_regrets.values())
-        
-        if regret_sum > 0:
-            strategy = {a: r/regret_sum for a, r in positive_regrets.items()}
-        else:
-            # Равномерная стратегия если нет положительных сожалений
-            actions = len(positive_regrets)
-            strategy = {a: 1.0/actions for a in positive_regrets}
-            
-        return strategy
+            with self.lock:
+                game_state = self._create_training_state()
+                if mode == 'outcome':
+                    self._outcome_sampling(game_state, 1.0, 1.0)
+                else:
+                    self._external_sampling(game_state)
+                self.iterations += 1
 
- def _evaluate_fantasy_potential(self, hand: Dict) -> float:
-        """Оценивает потенциал достижения фантазии"""
-        top_cards = hand.get('top', [])
-        if not top_cards:
-            return 0.0
-            
-        fantasy_check = self.rules.check_fantasy(top_cards)
-        if fantasy_check['fantasy']:
-            # Уже собрана фантазия
-            return 1.0
-            
-        # Оцениваем близость к фантазии
-        ranks = [card['rank'] for card in top_cards]
-        rank_counts = {}
-        for rank in ranks:
-            rank_counts[rank] = rank_counts.get(rank, 0) + 1
-            
-        # Оцениваем потенциал для различных типов фантазии
-        potential = 0.0
-        
-        # Для пар
-        for rank in 'QKA':
-            if rank_counts.get(rank, 0) == 1:
-                remaining_in_deck = self._count_remaining_rank(rank)
-                potential = max(potential, 0.5 * remaining_in_deck / 4)
-                
-        # Для сетов
-        for rank in '23456789TJQKA':
-            if rank_counts.get(rank, 0) == 2:
-                remaining_in_deck = self._count_remaining_rank(rank)
-                potential = max(potential, 0.8 * remaining_in_deck / 4)
-                
-        return potential
-        
-    def _evaluate_royalties(self, hand: Dict) -> float:
-        """Оценивает потенциальные бонусы"""
-        royalties = self.rules.get_royalties(hand)
-        total_royalties = sum(royalties.values())
-        
-        
-
-        # Нормализуем значение бонусов
-        max_possible_royalties = 50  # Максимально возможные бонусы
-        normalized_royalties = total_royalties / max_possible_royalties
-        
-        # Оцениваем потенциал фантазии
-        fantasy_potential = 0
-        if hand['top']:
-            fantasy_check = self.rules.check_fantasy(hand['top'])
-            if fantasy_check['fantasy']:
-                fantasy_potential = 1.0
-                if fantasy_check['type'] in ['KK', 'AA']:
-                    fantasy_potential = 1.5
-                elif 'Set' in fantasy_check['type']:
-                    fantasy_potential = 2.0
-                    
-        # Комбинируем все факторы
-        final_score = (base_hand_value + 
-                      normalized_royalties * self.royalty_weight +
-                      fantasy_potential * self.fantasy_weight)
-                      
-        return final_score
-
-    def _cfr_iteration(self, game_state: Dict, reach_probability: float):
-        """Выполняет одну итерацию CFR"""
+    def _external_sampling(self, game_state: GameState) -> float:
+        """Итерация external sampling MCCFR: возвращает оценку ценности узла"""
         if self._is_terminal(game_state):
             return self._get_terminal_value(game_state)
-            
-        info_set = self._get_information_set(game_state)
-        
-        # Получаем текущую стратегию
-        strategy = self._get_strategy(info_set)
-        
-        # Вычисляем значения для каждого действия
-        action_values = {}
-        node_value = 0
-        
-        for action in self._get_legal_actions(game_state):
-            next_state = self._apply_action(game_state, action)
-            action_value = -self._cfr_iteration(next_state, 
-                                              reach_probability * strategy[str(action)])
-            action_values[str(action)] = action_value
-            node_value += strategy[str(action)] * action_value
-            
-        # Обновляем сожаления и стратегию
-        for action in action_values:
-            regret = action_values[action] - node_value
-            self.regret_sum[info_set][action] = (
-                self.regret_sum[info_set].get(action, 0) + 
-                reach_probability * regret
-            )
-            self.strategy_sum[info_set][action] = (
-                self.strategy_sum[info_set].get(action, 0) + 
-                reach_probability * strategy[action]
-            )
-            
+        if not game_state.hand:
+            self._sample_chance(game_state)
+            value = self._external_sampling(game_state)
+            game_state.unmake_move()
+            return value
+
+        actions = self._get_legal_actions(game_state)
+        row = self.store.get_or_create(self._get_information_set(game_state, len(actions)), len(actions))
+        probs = self._get_strategy(row, len(actions))
+        sampled = self._sample_index(probs)
+
+        # Сыгранное действие продолжает траекторию, остальные оцениваются пробой
+        action_values = np.empty(len(actions))
+        for i, action in enumerate(actions):
+            game_state.make_move(action)
+            if i == sampled:
+                action_values[i] = self._external_sampling(game_state)
+            else:
+                action_values[i] = self._probe(game_state)
+            game_state.unmake_move()
+        node_value = float(probs @ action_values)
+
+        # Обновляем сожаления и накопленную стратегию
+        if row >= 0:
+            self.store.add_regrets(row, action_values - node_value)
+            self.store.add_strategy(row, probs)
+
         return node_value
 
-    def _get_legal_actions(self, game_state: Dict) -> List[Dict]:
+    def _outcome_sampling(self, game_state: GameState, reach: float,
+                          sample_prob: float) -> Tuple[float, float]:
+        """
+        Итерация outcome sampling MCCFR
+
+        Returns:
+            Tuple: (ценность исхода, деленная на вероятность выборки,
+                    вероятность хвоста траектории по текущей стратегии)
+        """
+        if self._is_terminal(game_state):
+            return self._get_terminal_value(game_state) / sample_prob, 1.0
+        if not game_state.hand:
+            self._sample_chance(game_state)
+            result = self._outcome_sampling(game_state, reach, sample_prob)
+            game_state.unmake_move()
+            return result
+
+        actions = self._get_legal_actions(game_state)
+        row = self.store.get_or_create(self._get_information_set(game_state, len(actions)), len(actions))
+        probs = self._get_strategy(row, len(actions))
+
+        # Действие выбирается по смеси текущей стратегии и равномерного исследования
+        sample_probs = self.exploration / len(actions) + (1 - self.exploration) * probs
+        sampled = self._sample_index(sample_probs)
+
+        game_state.make_move(actions[sampled])
+        utility, tail = self._outcome_sampling(
+            game_state,
+            reach * probs[sampled],
+            sample_prob * sample_probs[sampled]
+        )
+        game_state.unmake_move()
+
+        # Обновляем сожаления и накопленную стратегию
+        if row >= 0:
+            weight = utility * tail
+            regrets = np.full(len(actions), -weight * probs[sampled])
+            regrets[sampled] = weight * (1 - probs[sampled])
+            self.store.add_regrets(row, regrets)
+            self.store.add_strategy(row, reach / sample_prob * probs)
+
+        return utility, tail * probs[sampled]
+
+    def _probe(self, game_state: GameState) -> float:
+        """Доигрывает раздачу по текущей стратегии и возвращает итоговую ценность"""
+        changes = 0
+        while not self._is_terminal(game_state):
+            if not game_state.hand:
+                self._sample_chance(game_state)
+            else:
+                actions = self._get_legal_actions(game_state)
+                row = self.store.lookup(self._get_information_set(game_state, len(actions)))
+                game_state.make_move(actions[self._sample_index(self._get_strategy(row, len(actions)))])
+            changes += 1
+        value = self._get_terminal_value(game_state)
+
+        # Возвращаем состояние к узлу, из которого начата проба
+        for _ in range(changes):
+            game_state.unmake_move()
+        return value
+
+    def _sample_index(self, probs: np.ndarray) -> int:
+        """Выбирает индекс согласно распределению вероятностей"""
+        cumulative = np.cumsum(probs)
+        index = int(np.searchsorted(cumulative, self.rng.random() * cumulative[-1], side='right'))
+        return min(index, len(probs) - 1)
+
+    def _create_training_state(self) -> GameState:
+        """Создает начальное состояние раздачи для тренировки"""
+        return GameState()
+
+    def _sample_chance(self, game_state: GameState) -> None:
+        """Узел случая: раздает 5 карт в начале и по 3 карты на следующих улицах (откат - unmake_move)"""
+        count = 5 if game_state.placed == 0 else 3
+        game_state.deal(game_state.sample_deck(self.rng, count))
+
+    def _get_strategy(self, row: int, num_actions: int) -> np.ndarray:
+        """Получает текущую стратегию (regret matching) для строки хранилища"""
+        return self.store.current_strategy(row, num_actions)
+
+    def cache_stats(self) -> Dict:
+        """Счетчики попаданий кэшей терминальных оценок и доигровок"""
+        return {'terminal': self.terminal_cache.stats(), 'rollout': self.rollout.cache.stats()}
+
+    def _evaluate_winning_chances(self, game_state: GameState, actions: Sequence[Dict],
+                                  seed: Optional[int] = None, time_budget: Optional[float] = None,
+                                  stats: Optional[Dict] = None) -> List[Dict]:
+        """Оценивает кандидатов доигровками Монте-Карло (см. RolloutEngine.evaluate_actions)"""
+        return self.rollout.evaluate_actions(game_state, actions, seed=seed, time_budget=time_budget,
+                                             stats=stats)
+
+    def _get_legal_actions(self, game_state: GameState) -> Sequence[Dict]:
         """Получает список возможных действий"""
-        if game_state.get('fantasy_mode'):
+        if game_state.fantasy_mode:
             return self._get_fantasy_actions(game_state)
         return self._get_regular_actions(game_state)
-        
-    def _get_fantasy_actions(self, game_state: Dict) -> List[Dict]:
+
+    def _get_fantasy_actions(self, game_state: GameState) -> List[Dict]:
         """Генерирует возможные действия для режима фантазии"""
-        available_cards = self._get_available_cards(game_state)
-        hand_size = self._get_fantasy_hand_size(game_state)
-        
-        possible_hands = []
-        self._generate_fantasy_hands(available_cards, hand_size, [], possible_hands)
-        
-        return possible_hands
-        
-    def _generate_fantasy_hands(self, available_cards: List[Dict], 
-                              cards_needed: int,
-                              current_hand: List[Dict],
-                              possible_hands: List[Dict]):
-        """Рекурсивно генерирует возможные руки для фантазии"""
-        if cards_needed == 0:
-            if self.rules.is_valid_hand(current_hand[:3],
-                                      current_hand[3:8],
-                                      current_hand[8:]):
-                possible_hands.append(current_hand.copy())
-            return
-            
-        for i, card in enumerate(available_cards):
-            current_hand.append(card)
-            remaining_cards = available_cards[:i] + available_cards[i+1:]
-            self._generate_fantasy_hands(remaining_cards,
-                                      cards_needed - 1,
-                                      current_hand,
-                                      possible_hands)
-            current_hand.pop()
-            
-    def _get_fantasy_hand_size(self, game_state: Dict) -> int:
-        """Определяет количество карт для фантазии"""
-        if not self.progressive:
-            return 14
-            
-        top_line = game_state['table']['top']
-        fantasy_info = self.rules.check_fantasy(top_line)
-        return fantasy_info['extra_cards']
-        
-    def _get_available_cards(self, game_state: Dict) -> List[Dict]:
-        """Получает список доступных карт"""
-        used_cards = set()
-        
-        # Собираем использованные карты
-        for line in ['top', 'middle', 'bottom']:
-            for card in game_state['table'].get(line, []):
-                if card:
-                    used_cards.add(f"{card['rank']}{card['suit']}")
-                    
-        # Добавляем видимые карты противников
-        for card in game_state.get('visible_cards', []):
-            used_cards.add(f"{card['rank']}{card['suit']}")
-            
-        # Генерируем доступные карты
-        available = []
-        for rank in 'AKQJT98765432':
-            for suit in '♠♣♥♦':
-                card_key = f"{rank}{suit}"
-                if card_key not in used_cards:
-                    available.append({'rank': rank, 'suit': suit})
-                    
-        return available
-
-    def _is_terminal(self, game_state: Dict) -> bool:
-        """Проверяет, является ли состояние конечным"""
-        return (len(game_state['table']['top']) == 3 and
-                len(game_state['table']['middle']) == 5 and
-                len(game_state['table']['bottom']) == 5)
-def _get_terminal_value(self, game_state: Dict) -> float:
-        """Вычисляет значение конечного состояния"""
-        if not self._is_valid_hand(game_state['table']):
-            return -1000  # Штраф за невалидную руку
-            
-        # Оцениваем комбинации
-hand_value = (
-            self.evaluator.evaluate_top(game_state['table']['top']) +
-            self.evaluator.evaluate_middle(game_state['table']['middle']) +
-            self.evaluator.evaluate_bottom(game_state['table']['bottom'])
-        )
-        
-        # Учитываем бонусы
-royalties = self.rules.get_royalties(game_state['table'])
-        royalty_value = sum(royalties.values())
-        
-        # Проверяем фантазию
-        fantasy_value = 0
-        if self.rules.check_fantasy(game_state['table']['top'])['fantasy']:
-            fantasy_value = 100  # Большой бонус за фантазию
-return hand_value + royalty_value + fantasy_value
-        
-    def _get_information_set(self, game_state: Dict) -> str:
-        """Создает строковое представление информационного набора"""
-        info_parts = []
-        
-        # Добавляем информацию о картах на столе
-
-for line in ['top', 'middle', 'bottom']:
-            cards = game_state['table'].get(line, [])
-            info_parts.append(''.join(f"{c['rank']}{c['suit']}" for c in cards if c))
-            
-        # Добавляем информацию о видимых картах
-        visible = sorted(
-f"{c['rank']}{c['suit']}" for c in game_state.get('visible_cards', [])
-        )
-        info_parts.append(''.join(visible))
-        
-        # Добавляем режим фантазии
-        if game_state.get('fantasy_mode'):
-info_parts.append('F')
-            if self.progressive:
-                info_parts.append('P')
-                
-        return '|'.join(info_parts)
-        
-    def _get_strategy(self, info_set: str) -> Dict[str, float]:
-        """Получает текущую стратегию для информационного набора"""
-if info_set not in self.strategy_map:
-
-    def _evaluate_royalties(self, hand: Dict) -> float:
-        """Оценивает потенциальные бонусы"""
-        royalties = self.rules.get_royalties(hand)
-        total_royalties = sum(royalties.values())
-        
-        # Нормализуем значение бонусов
-        max_possible_royalties = 97  # 22 (top) + 50 (middle) + 25 (bottom)
-        normalized_royalties = total_royalties / max_possible_royalties
-        
-        return normalized_royalties
-        
-    def _get_strategy(self, info_set: str) -> Dict:
-        """Получает текущую стратегию для информационного набора"""
-        if info_set not in self.strategy_map:
-            # Инициализируем новую стратегию
-            return self._initialize_strategy(info_set)
-            
-        strategy = {}
-        normalizing_sum = 0
-        
-        # Получаем все возможные действия для этого состояния
-        actions = self._get_legal_actions(info_set)
-        
-        # Вычисляем стратегию на основе накопленных сожалений
-        for action in actions:
-            strategy_sum = self.strategy_sum.get((info_set, str(action)), 0)
-            regret_sum = self.regret_sum.get((info_set, str(action)), 0)
-            
-            if regret_sum > 0:
-                strategy[str(action)] = regret_sum
-            else:
-                strategy[str(action)] = 0
-            normalizing_sum += strategy[str(action)]
-            
-        # Нормализуем стратегию
-        if normalizing_sum > 0:
-            for action in actions:
-                strategy[str(action)] /= normalizing_sum
-        else:
-            # Если нет положительных сожалений, используем равномерное распределение
-            prob = 1.0 / len(actions)
-            for action in actions:
-                strategy[str(action)] = prob
-                
-        return strategy
-        
-    def _initialize_strategy(self, info_set: str) -> Dict:
-        """Инициализирует новую стратегию для информационного набора"""
-        actions = self._get_legal_actions(info_set)
-        strategy = {}
-        
-        # Равномерное распределение вероятностей
-        prob = 1.0 / len(actions)
-        for action in actions:
-            strategy[str(action)] = prob
-            
-        self.strategy_map[info_set] = strategy
-        return strategy
-        
-    def _update_regrets(self, info_set: str, action: str, regret: float):
-        """Обновляет накопленные сожаления"""
-        key = (info_set, action)
-        self.regret_sum[key] = self.regret_sum.get(key, 0) + regret
-        
-    def _update_strategy_sum(self, info_set: str, strategy: Dict):
-        """Обновляет накопленную стратегию"""
-        for action, prob in strategy.items():
-            key = (info_set, action)
-            self.strategy_sum[key] = self.strategy_sum.get(key, 0) + prob
-            
-    def _cfr_iteration(self, game_state: Dict, reach_prob: float):
-        """Выполняет одну итерацию CFR"""
-        info_set = self._get_information_set(game_state)
-        strategy = self._get_strategy(info_set)
-        
-        # Вычисляем значения для каждого действия
-        action_values = {}
-        for action in self._get_legal_actions(info_set):
-            next_state = self._apply_action(game_state, action)
-            action_values[str(action)] = self._cfr_value(next_state, reach_prob * strategy[str(action)])
-            
-        # Вычисляем ожидаемое значение узла
-        node_value = sum(prob * action_values[action] for action, prob in strategy.items())
-        
-        # Обновляем сожаления и накопленную стратегию
-        for action in self._get_legal_actions(info_set):
-            regret = action_values[str(action)] - node_value
-            self._update_regrets(info_set, str(action), reach_prob * regret)
-            
-        self._update_strategy_sum(info_set, strategy)
-        return node_value
-        
-    def _cfr_value(self, game_state: Dict, reach_prob: float) -> float:
-        """Вычисляет значение для состояния игры"""
-        if self._is_terminal(game_state):
-            return self._get_terminal_value(game_state)
-            
-        return self._cfr_iteration(game_state, reach_prob)
-        
-    def _is_terminal(self, game_state: Dict) -> bool:
+        best_hand = self.fantasy_solver.solve(game_state.hand, self.fantasy_time_budget)
+        return [best_hand] if best_hand else []
+
+    def _get_regular_actions(self, game_state: GameState) -> MoveList:
+        """Генерирует размещения карт руки: все 5 карт в начале, затем 2 из 3 со сбросом"""
+        groups = self._symmetry_groups(game_state)
+
+        # Канонический порядок карт: слот действия означает "k-я по старшинству карта в линию",
+        # масти сравниваются после канонической перенумерации, чтобы порядок не зависел от них
+        suit_map = canonical_suit_map(groups)
+        hand = sorted(game_state.hand, key=lambda c: (c & ~3) | suit_map[c & 3], reverse=True)
+
+        # Размещения, переходящие друг в друга при перестановке мастей, равноценны;
+        # действия декодируются из компактных кодов только при обращении
+        return MoveList(generate_moves(hand, game_state.free_slots(), discard=game_state.placed > 0, groups=groups), hand)
+
+    def _symmetry_groups(self, game_state: GameState) -> List[List[int]]:
+        """Группы карт, которые должна сохранять перестановка мастей"""
+        table = game_state.table
+        return [table[line] for line in LINES] + [game_state.hand, game_state.visible_cards]
+
+    def _is_terminal(self, game_state: GameState) -> bool:
         """Проверяет, является ли состояние терминальным"""
-        if not game_state:
-            return True
-            
-        # Проверяем завершение раздачи
-        cards_placed = sum(len(line) for line in game_state['table'].values())
-        return cards_placed == 13  # 3 (top) + 5 (middle) + 5 (bottom)
-        
-    def _get_terminal_value(self, game_state: Dict) -> float:
-        """Вычисляет значение терминального состояния"""
-        if not self._is_valid_hand(game_state):
-            return -1.0  # Штраф за невалидную руку
-            
-        # Оцениваем комбинации
-        hand_value = self._evaluate_hand(game_state)
-        royalties = self._evaluate_royalties(game_state)
-        fantasy_potential = self._evaluate_fantasy_potential(game_state)
-        
-        # Комбинируем все факторы
-        total_value = (hand_value + royalties) * (1 + self.fantasy_bonus * fantasy_potential)
-        
-        return total_value
+        return game_state.is_complete  # 3 (top) + 5 (middle) + 5 (bottom)
+
+    def _get_terminal_value(self, game_state: GameState) -> float:
+        """Вычисляет значение терминального состояния в очках (с кэшем по хешу доски)"""
+        table = game_state.table
+        key = (zobrist_hash([table[line] for line in LINES]), self.weights['winning'],
+               self.foul_penalty, self.fantasy_bonus)
+        value = self.terminal_cache.get(key)
+        if value is None:
+            value = self._score_board(table)
+            self.terminal_cache.put(key, value)
+        return value
+
+    def _score_board(self, table: Dict[str, List[int]]) -> float:
+        """Очки полной доски: сила линий, бонусы и фантазия либо штраф за мертвую руку"""
+        if not self.rules.is_valid_hand(table['top'], table['middle'], table['bottom']):
+            return -self.foul_penalty  # Штраф за невалидную руку
+
+        # Оцениваем комбинации и бонусы
+        hand_value = self.evaluator.calculate_hand_strength(table)
+        royalty_value = sum(self.rules.get_royalties(table).values())
+
+        # Проверяем фантазию
+        fantasy_value = 0.0
+        if self.rules.check_fantasy(table['top'])['fantasy']:
+            fantasy_value = self.fantasy_bonus
+
+        return self.weights['winning'] * hand_value + royalty_value + fantasy_value
+
+    def _get_information_set(self, game_state: GameState, num_actions: int) -> str:
+        """Создает ключ информационного набора через абстракцию карт"""
+        info_set = self.abstraction.bucket(game_state)
+
+        # Число действий зависит от симметрии мастей, а ширина строки хранилища фиксирована
+        info_set += f'|#{num_actions}'
+
+        # Добавляем режим прогрессивной фантазии
+        if game_state.fantasy_mode and self.progressive:
+            info_set += '|P'
+
+        return info_set
@@ -0,0 +1,107 @@
+# ai/moves.py
+from typing import List, Dict, Iterator, Sequence, Tuple
+from collections.abc import Sequence as SequenceABC
+from functools import lru_cache
+from .isomorphism import ACTION_LINES, automorphism_tables
+
+# Ход кодируется целым числом: у k-й карты руки 2 бита с кодом линии
+# (0 - top, 1 - middle, 2 - bottom, 3 - сброс)
+DISCARD = 3
+BITS_PER_CARD = 2
+CODE_MASK = (1 << BITS_PER_CARD) - 1
+
+Pattern = Tuple[int, Tuple[int, ...]]
+
+@lru_cache(maxsize=None)
+def placement_patterns(num_cards: int, free: Tuple[int, int, int], discard: bool) -> Tuple[Pattern, ...]:
+    """
+    Все распределения карт руки по линиям с учетом свободных мест
+
+    Зависят только от числа карт, свободных мест и наличия сброса, поэтому
+    строятся один раз. Порядок совпадает с перебором product(range(3)) с
+    фильтром по вместимости (сброс - во внешнем цикле), так что индексы
+    действий в сохраненных стратегиях не меняются.
+
+    Returns:
+        Tuple: Пары (код хода, коды линий по картам)
+    """
+    placements: List[Tuple[int, ...]] = []
+
+    def place(codes: Tuple[int, ...], free: Tuple[int, ...], remaining: int) -> None:
+        if not remaining:
+            placements.append(codes)
+            return
+        for line in range(3):
+            if free[line]:
+                place(codes + (line,), free[:line] + (free[line] - 1,) + free[line + 1:], remaining - 1)
+
+    if not discard:
+        place((), free, num_cards)
+        patterns = placements
+    else:
+        place((), free, num_cards - 1)
+        patterns = [codes[:d] + (DISCARD,) + codes[d:] for d in range(num_cards) for codes in placements]
+
+    return tuple((encode_codes(codes), codes) for codes in patterns)
+
+def encode_codes(codes: Sequence[int]) -> int:
+    """Код хода по кодам линий карт руки"""
+    move = 0
+    for i, code in enumerate(codes):
+        move |= code << (BITS_PER_CARD * i)
+    return move
+
+def generate_moves(hand: Sequence[int], free: Sequence[int], discard: bool,
+                   groups: Sequence[Sequence[int]] = ()) -> Iterator[int]:
+    """
+    Лениво перечисляет коды ходов без повторов
+
+    Ходы, переходящие друг в друга при перестановке мастей, сохраняющей группы
+    карт состояния (например, две одинаковые по рангу карты разных мастей,
+    которые больше нигде не встречаются), выдаются один раз - первым в порядке
+    перебора.
+
+    Args:
+        hand: Карты руки в порядке, задающем биты кода
+        free: Свободные места в top, middle, bottom
+        discard: Сбрасывается ли одна карта (все улицы после первой)
+        groups: Группы карт для симметрии мастей (см. ai.isomorphism)
+    """
+    patterns = placement_patterns(len(hand), tuple(free), discard)
+    tables = automorphism_tables(groups) if groups else []
+    if len(tables) <= 1:
+        for move, _ in patterns:
+            yield move
+        return
+
+    # Ключ хода - число, где у каждой карты 3 бита с номером линии (1-4)
+    shifts = [[3 * table[card] for card in hand] for table in tables]
+    seen = set()
+    for move, codes in patterns:
+        key = min(sum((code + 1) << shift for code, shift in zip(codes, card_shifts))
+                  for card_shifts in shifts)
+        if key not in seen:
+            seen.add(key)
+            yield move
+
+def decode_move(move: int, hand: Sequence[int]) -> Dict[str, List[int]]:
+    """Действие {'top', 'middle', 'bottom', 'discard'} по коду хода"""
+    action: Dict[str, List[int]] = {line: [] for line in ACTION_LINES}
+    for i, card in enumerate(hand):
+        action[ACTION_LINES[(move >> (BITS_PER_CARD * i)) & CODE_MASK]].append(card)
+    return action
+
+class MoveList(SequenceABC):
+    """Список ходов, который декодирует действие только при обращении к нему"""
+
+    def __init__(self, moves: Iterator[int], hand: Sequence[int]):
+        self.moves = list(moves)
+        self.hand = list(hand)
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [decode_move(move, self.hand) for move in self.moves[index]]
+        return decode_move(self.moves[index], self.hand)
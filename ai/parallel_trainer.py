@@ -0,0 +1,184 @@
+# ai/parallel_trainer.py
+from typing import Dict, List, Optional, Callable, Tuple
+import multiprocessing
+import os
+from .mccfr_agent import MCCFRAgent
+from .strategy_store import StrategyStore
+
+def _train_worker(connection, config: Dict, store: StrategyStore) -> None:
+    """
+    Рабочий процесс: держит реплику таблиц агента между раундами
+
+    Каждый раунд получает приращения прошлого раунда от всех процессов, отменяет
+    свои изменения и применяет их в том же порядке, что и основной процесс (так
+    индексы строк реплики и агента совпадают), затем тренируется и отправляет
+    разреженные приращения только затронутых строк.
+    """
+    agent = MCCFRAgent(progressive=config['progressive'],
+                       max_table_bytes=store.max_bytes,
+                       abstraction=config['abstraction'])
+    agent.weights.update(config['weights'])
+    agent.exploration = config['exploration']
+    agent.foul_penalty = config['foul_penalty']
+    agent.fantasy_bonus = config['fantasy_bonus']
+    agent.store = store
+
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        deltas, iterations, mode, seed = message
+        try:
+            if deltas:
+                store.rollback()
+                for delta in deltas:
+                    store.merge(delta)
+            store.track_changes()
+            agent.rng.seed(seed)
+            agent.train(iterations, mode=mode)
+            connection.send(store.changes())
+        except Exception as e:
+            connection.send(e)
+            break
+    connection.close()
+
+class ParallelTrainer:
+    """
+    Параллельная тренировка MCCFR в пуле процессов
+
+    Итерации делятся на раунды. Снимок таблиц агента передается каждому
+    рабочему процессу один раз (при fork - без сериализации); дальше процессы
+    обмениваются только приращениями затронутых за раунд строк, которые
+    складываются в таблицы агента и в реплики процессов.
+    """
+
+    def __init__(self, agent: MCCFRAgent, processes: Optional[int] = None, sync_every: int = 500):
+        self.agent = agent
+        self.processes = max(1, processes or os.cpu_count() or 1)
+        self.sync_every = sync_every  # Итераций на процесс между слияниями
+
+    def train(self, iterations: int, mode: str = 'outcome',
+              callback: Optional[Callable[[int], bool]] = None) -> int:
+        """
+        Тренирует агента, распределяя итерации по процессам
+
+        Args:
+            iterations: Общее количество итераций
+            mode: Режим тренировки (см. MCCFRAgent.train)
+            callback: Вызывается после каждого раунда с числом выполненных итераций;
+                      если возвращает False, тренировка останавливается
+
+        Returns:
+            int: Количество выполненных итераций
+        """
+        if mode not in MCCFRAgent.TRAINING_MODES:
+            raise ValueError(f"Unknown training mode: {mode}")
+
+        if self.processes == 1:
+            return self._train_serial(iterations, mode, callback)
+
+        workers: List[Tuple[multiprocessing.Process, object]] = []
+        store: Optional[StrategyStore] = None
+        synced_rows = 0
+        deltas: List[Dict] = []
+        done = 0
+        try:
+            while done < iterations:
+                shards = self._split(min(iterations - done, self.processes * self.sync_every))
+
+                # Реплики создаются заново, только если таблицы агента изменились
+                # в обход тренировки (например, загружено другое состояние)
+                with self.agent.lock:
+                    if self.agent.store is not store or len(store) != synced_rows:
+                        self._stop_workers(workers)
+                        store = self.agent.store
+                        workers = self._start_workers(store.copy())
+                        deltas = []
+                    synced_rows = len(store)
+
+                for (_, connection), count in zip(workers, shards):
+                    connection.send((deltas, count, mode, self.agent.rng.getrandbits(32)))
+                deltas = [self._receive(connection) for _, connection in workers]
+
+                if any(delta['base_rows'] != synced_rows for delta in deltas):
+                    # Реплики разошлись с агентом (например, на лимите памяти):
+                    # раунд отбрасывается, процессы получат новый снимок
+                    store = None
+                    continue
+
+                with self.agent.lock:
+                    if self.agent.store is not store or len(store) != synced_rows:
+                        # Пока процессы считали, таблицы агента заменили или
+                        # изменили в обход тренировки: приращения к ним не относятся
+                        store = None
+                        continue
+                    for delta, count in zip(deltas, shards):
+                        self.agent.merge(delta, count)
+                    synced_rows = len(store)
+
+                round_iterations = sum(shards)
+                done += round_iterations
+                if callback and callback(done) is False:
+                    break
+        finally:
+            self._stop_workers(workers)
+        return done
+
+    def _start_workers(self, snapshot: StrategyStore) -> List[Tuple[multiprocessing.Process, object]]:
+        """Запускает процессы с репликой таблиц"""
+        config = self._config()
+        workers = []
+        for _ in range(self.processes):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_train_worker, args=(child, config, snapshot), daemon=True)
+            process.start()
+            child.close()
+            workers.append((process, parent))
+        return workers
+
+    def _stop_workers(self, workers: List[Tuple[multiprocessing.Process, object]]) -> None:
+        for process, connection in workers:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+        for process, _ in workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        workers.clear()
+
+    def _receive(self, connection) -> Dict:
+        result = connection.recv()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _train_serial(self, iterations: int, mode: str,
+                      callback: Optional[Callable[[int], bool]]) -> int:
+        """Тренировка в текущем процессе теми же раундами"""
+        done = 0
+        while done < iterations:
+            count = min(iterations - done, self.sync_every)
+            self.agent.train(count, mode=mode)
+            done += count
+            if callback and callback(done) is False:
+                break
+        return done
+
+    def _split(self, iterations: int) -> list:
+        """Делит итерации раунда между процессами (процесс может получить 0 итераций)"""
+        base, extra = divmod(iterations, self.processes)
+        return [base + (1 if i < extra else 0) for i in range(self.processes)]
+
+    def _config(self) -> Dict:
+        """Параметры агента, которые нужны рабочим процессам"""
+        return {
+            'progressive': self.agent.progressive,
+            'abstraction': self.agent.abstraction.name,
+            'weights': dict(self.agent.weights),
+            'exploration': self.agent.exploration,
+            'foul_penalty': self.agent.foul_penalty,
+            'fantasy_bonus': self.agent.fantasy_bonus
+        }
@@ -0,0 +1,91 @@
+# ai/policy.py
+from typing import Dict, Optional, Union, BinaryIO
+import numpy as np
+from .checkpoint import save_checkpoint, dumps_checkpoint, load_checkpoint
+from .key_index import LazyKeyIndex
+from .strategy_store import StrategyStore
+
+QUANT_LEVELS = 255  # Вероятности хранятся в uint8 долями 1/255
+
+def average_policy(store: StrategyStore, prune_threshold: float = 0.01) -> np.ndarray:
+    """
+    Нормированная средняя стратегия всех наборов с отсечением редких действий
+
+    Действия с вероятностью ниже prune_threshold обнуляются (самое вероятное
+    действие набора остается всегда), строки перенормируются.
+
+    Returns:
+        np.ndarray: Вероятности действий (float64) в раскладке слотов хранилища
+    """
+    if store.num_rows == 0:
+        return np.zeros(0)
+
+    offsets = np.asarray(store.offsets[:store.num_rows])
+    widths = np.asarray(store.widths[:store.num_rows]).astype(np.int64)
+    sums = np.asarray(store.strategy_sum[:store.num_slots], dtype=np.float64)
+
+    # Строки без накопленной стратегии - равномерные
+    totals = np.add.reduceat(sums, offsets)
+    empty = np.repeat(totals <= 0, widths)
+    probs = np.where(empty, 1.0, sums) / np.repeat(np.where(totals > 0, totals, widths), widths)
+
+    row_max = np.repeat(np.maximum.reduceat(probs, offsets), widths)
+    probs = np.where((probs >= prune_threshold) | (probs >= row_max), probs, 0.0)
+    return probs / np.repeat(np.add.reduceat(probs, offsets), widths)
+
+def quantize_policy(probs: np.ndarray) -> np.ndarray:
+    """Квантует вероятности в uint8; у оставленных действий минимум один уровень"""
+    quantized = np.rint(probs * QUANT_LEVELS)
+    quantized[(probs > 0) & (quantized == 0)] = 1
+    return np.minimum(quantized, QUANT_LEVELS).astype(np.uint8)
+
+def export_policy(store: StrategyStore, target: Optional[Union[str, BinaryIO]] = None,
+                  meta: Optional[Dict] = None, prune_threshold: float = 0.01) -> Optional[bytes]:
+    """
+    Записывает файл политики: квантованная средняя стратегия и индекс ключей
+
+    Args:
+        store: Хранилище с накопленными стратегиями
+        target: Путь или бинарный файл; если не задан, возвращаются байты
+        meta: Дополнительные метаданные
+        prune_threshold: Порог отсечения редких действий
+    """
+    arrays = store.to_arrays()
+    probs = average_policy(store, prune_threshold)
+    policy_arrays = {name: arrays[name] for name in ('keys', 'key_offsets', 'key_order', 'offsets', 'widths')}
+    policy_arrays['probs'] = quantize_policy(probs)
+
+    meta = dict(meta or {}, format='policy', prune_threshold=prune_threshold)
+    if target is None:
+        return dumps_checkpoint(meta, policy_arrays)
+    save_checkpoint(target, meta, policy_arrays)
+    return None
+
+class Policy:
+    """Политика только для чтения: вероятности действия набора - один срез массива uint8"""
+
+    def __init__(self, meta: Dict, arrays: Dict[str, np.ndarray]):
+        self.meta = meta
+        self.index = LazyKeyIndex(arrays['keys'], arrays['key_offsets'], arrays['key_order'])
+        self.offsets = arrays['offsets']
+        self.widths = arrays['widths']
+        self.probs = arrays['probs']
+
+    @classmethod
+    def load(cls, source: Union[str, bytes], mmap: bool = True) -> 'Policy':
+        meta, arrays = load_checkpoint(source, mmap=mmap)
+        if meta.get('format') != 'policy':
+            raise ValueError("Not a policy file")
+        return cls(meta, arrays)
+
+    def __len__(self) -> int:
+        return len(self.widths)
+
+    def strategy(self, key: str, num_actions: int) -> Optional[np.ndarray]:
+        """Вероятности действий набора или None, если набора нет в политике"""
+        row = self.index.get(key, -1)
+        if row < 0 or self.widths[row] != num_actions:
+            return None
+        start = int(self.offsets[row])
+        quantized = self.probs[start:start + num_actions].astype(np.float64)
+        return quantized / quantized.sum()
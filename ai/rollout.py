@@ -0,0 +1,259 @@
+# ai/rollout.py
+from typing import List, Dict, Optional, Sequence, Tuple
+import time
+import numpy as np
+from .evaluator import HandEvaluator
+from .game_state import GameState
+from .isomorphism import LINES, LINE_SIZES
+from .transposition import TranspositionCache, canonical_hash
+
+# Позиции линий в доске из 13 карт (раскладка evaluate_batch)
+LINE_OFFSETS = {'top': 0, 'middle': 3, 'bottom': 8}
+
+class RolloutEngine:
+    """
+    Оценка кандидатов хода доигровками Монте-Карло
+
+    Каждая выборка раздает оставшиеся улицы из колоды (карты стола, руки и
+    видимые карты в нее не входят): на улице приходят 3 карты, младшая по
+    рангу сбрасывается. Полученные карты раскладываются по свободным местам
+    случайно, поэтому итог - ценность хода при случайной дальнейшей игре:
+    EV занижен, а риск мертвой руки завышен. При completions > 1 берется
+    лучшая из completions случайных раскладок, но выбирается она по всем
+    картам раздачи, то есть со знанием будущих улиц: такая оценка
+    оптимистична (мертвая рука недооценивается, EV завышается).
+    Все кандидаты оцениваются на одних и тех же раздачах, что уменьшает
+    дисперсию их сравнения, а доски всех кандидатов считаются
+    одним вызовом HandEvaluator.evaluate_batch.
+
+    Итоги кэшируются по каноническому хешу доски после действия вместе с
+    видимыми картами (они определяют оставшуюся колоду): повторяющиеся позиции
+    между запросами не пересчитываются.
+    """
+
+    def __init__(self, samples: int = 64, completions: int = 1, chunk: int = 16,
+                 time_budget: Optional[float] = 1.0, foul_penalty: float = 6.0,
+                 fantasy_bonus: float = 15.0, cache: Optional[TranspositionCache] = None):
+        self.samples = samples              # Выборок на кандидата
+        self.completions = completions      # Случайных раскладок на выборку (>1 - со знанием будущих карт)
+        self.chunk = chunk                  # Выборок за один раунд
+        self.time_budget = time_budget      # Лимит времени на оценку (сек), None - без лимита
+        self.foul_penalty = foul_penalty    # Штраф за мертвую руку
+        self.fantasy_bonus = fantasy_bonus  # Ценность попадания в фантазию
+        self.cache = cache                  # Итоги оценок по хешу позиции
+
+    def evaluate_actions(self, game_state: GameState, actions: Sequence[Dict],
+                         samples: Optional[int] = None, seed: Optional[int] = None,
+                         time_budget: Optional[float] = None, stats: Optional[Dict] = None) -> List[Dict]:
+        """
+        Оценивает действия из состояния с рукой
+
+        Выборки добавляются раундами до chunk всем кандидатам сразу, пока не
+        набрано samples или пока следующий раунд укладывается в лимит времени
+        (первый раунд выполняется всегда).
+        Кандидаты с закэшированным итогом не меньше чем на samples выборок не
+        пересчитываются; с заданным seed кэш только пополняется, чтобы оценка
+        оставалась воспроизводимой.
+
+        Args:
+            game_state: Состояние до хода
+            actions: Кандидаты хода
+            samples: Выборок на кандидата (по умолчанию self.samples)
+            seed: Зерно генератора для воспроизводимой оценки
+            time_budget: Лимит времени (по умолчанию self.time_budget)
+            stats: Словарь, в который записывается объем оценки: 'candidates',
+                'cached', 'samples', 'rounds', 'complete', 'elapsed'
+
+        Returns:
+            List[Dict]: Для каждого действия 'ev' (в очках: сила руки, бонусы и
+            фантазия, у мертвой руки - штраф), 'stderr', 'strength', 'royalties',
+            'foul' и 'fantasy' (вероятности) и 'samples'
+        """
+        return self.evaluate_positions([(game_state, actions)], samples, seed, time_budget, stats)[0]
+
+    def evaluate_positions(self, positions: Sequence[Tuple[GameState, Sequence[Dict]]],
+                           samples: Optional[int] = None, seed: Optional[int] = None,
+                           time_budget: Optional[float] = None,
+                           stats: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        Оценивает кандидатов сразу для нескольких состояний (например, столов)
+
+        У каждого состояния своя колода и свои раздачи, но доски всех кандидатов
+        всех состояний за раунд оцениваются одним вызовом evaluate_batch.
+        Параметры и итоги - как у evaluate_actions, по списку на состояние.
+        """
+        started = time.perf_counter()
+        samples = self.samples if samples is None else samples
+        budget = self.time_budget if time_budget is None else time_budget
+        rng = np.random.default_rng(seed)
+
+        groups = []
+        results: List[List[Optional[Dict]]] = []
+        num_candidates = 0
+        num_cached = 0
+        for game_state, actions in positions:
+            keys = [self._key(game_state, action) for action in actions] if self.cache is not None else []
+            cached = [self.cache.get(key) for key in keys] if keys and seed is None else [None] * len(keys)
+            found = [entry if entry is not None and entry['samples'] >= samples else None
+                     for entry in cached] or [None] * len(actions)
+            pending = [i for i, result in enumerate(found) if result is None]
+            bases, empty = self._boards(game_state, [actions[i] for i in pending])
+            groups.append({
+                'keys': keys,
+                'cached': cached,
+                'pending': pending,
+                'bases': bases,
+                'empty': empty,
+                'deck': np.array(game_state.deck_cards(), dtype=np.int64),
+                'totals': np.zeros((len(pending), 7))  # n, ev, ev^2, strength, royalties, foul, fantasy
+            })
+            results.append(found)
+            num_candidates += len(actions)
+            num_cached += len(actions) - len(pending)
+        active = [group for group in groups if group['pending']]
+
+        # С лимитом времени раунды растут от chunk/8 выборок вдвое до chunk,
+        # чтобы обязательный первый раунд был коротким
+        round_size = self.chunk if budget is None else max(1, self.chunk // 8)
+        done = 0
+        rounds = 0
+        while done < samples and active:
+            round_started = time.perf_counter()
+            count = min(round_size, samples - done)
+            round_size = min(2 * round_size, self.chunk)
+            boards = [self._complete(group['bases'], group['empty'],
+                                     self._deal(group['deck'], group['empty'].shape[1], count, rng), rng)
+                      for group in active]
+            result = HandEvaluator.evaluate_batch(np.concatenate([b.reshape(-1, 13) for b in boards]))
+            start = 0
+            for group, group_boards in zip(active, boards):
+                size = group_boards.shape[0] * group_boards.shape[1] * group_boards.shape[2]
+                self._add_totals(group['totals'], {name: values[start:start + size] for name, values in result.items()},
+                                 group_boards.shape[:3])
+                start += size
+            done += count
+            rounds += 1
+            # Раунд, который не успеет закончиться до конца лимита, не начинается
+            now = time.perf_counter()
+            if budget is not None and (now - started) + (now - round_started) * round_size / count > budget:
+                break
+
+        for group, found in zip(groups, results):
+            keys, cached = group['keys'], group['cached']
+            for i, row in zip(group['pending'], group['totals']):
+                found[i] = self._summary(row)
+                if keys and (cached[i] is None or cached[i]['samples'] < found[i]['samples']):
+                    self.cache.put(keys[i], found[i])
+
+        if stats is not None:
+            stats.update({
+                'candidates': num_candidates,
+                'cached': num_cached,
+                'samples': done * (num_candidates - num_cached),
+                'rounds': rounds,
+                'complete': done >= samples or not active,
+                'elapsed': time.perf_counter() - started
+            })
+        return results
+
+    def _key(self, game_state: GameState, action: Dict):
+        """Ключ кэша: позиция после действия и параметры доигровки"""
+        groups = [game_state.table[line] + action.get(line, []) for line in LINES]
+        groups.append(())
+        groups.append(game_state.visible_cards + action.get('discard', []))
+        return canonical_hash(groups), self.completions, self.foul_penalty, self.fantasy_bonus
+
+    def _boards(self, game_state: GameState, actions: Sequence[Dict]):
+        """Доски после каждого действия (пустые места - -1) и индексы пустых мест"""
+        bases = np.full((len(actions), 13), -1, dtype=np.int64)
+        empty = []
+        for i, action in enumerate(actions):
+            slots = []
+            for line in LINES:
+                cards = game_state.table[line] + action.get(line, [])
+                offset = LINE_OFFSETS[line]
+                bases[i, offset:offset + len(cards)] = cards
+                slots.extend(range(offset + len(cards), offset + LINE_SIZES[line]))
+            empty.append(slots)
+        # Все действия из одного состояния занимают одинаковое число мест
+        if not actions:
+            return bases, np.zeros((0, 0), dtype=np.int64)
+        return bases, np.array(empty, dtype=np.int64).reshape(len(actions), -1)
+
+    def _deal(self, deck: np.ndarray, needed: int, count: int, rng: np.random.Generator) -> np.ndarray:
+        """Карты, которые игрок положит на стол, для count раздач: (count, needed)"""
+        if needed == 0:
+            return np.zeros((count, 0), dtype=np.int64)
+        streets = needed // 2
+        drawn = min(len(deck), needed + streets)
+        if drawn < needed:
+            raise ValueError("Not enough cards left in the deck to complete the board")
+        order = rng.random((count, len(deck))).argsort(axis=1)[:, :drawn]
+        cards = deck[order]
+
+        # Улицы по 3 карты: сбрасывается младшая (если колода позволяет)
+        streets = drawn - needed
+        if not streets:
+            return cards
+        triples = cards[:, :3 * streets].reshape(count, streets, 3)
+        keep = np.ones(triples.shape, dtype=bool)
+        np.put_along_axis(keep, (triples >> 2).argmin(axis=2)[:, :, None], False, axis=2)
+        kept = triples[keep].reshape(count, 2 * streets)
+        return np.concatenate([kept, cards[:, 3 * streets:]], axis=1)
+
+    def _complete(self, bases: np.ndarray, empty: np.ndarray, cards: np.ndarray,
+                  rng: np.random.Generator) -> np.ndarray:
+        """Раскладывает розданные карты по доскам всех действий: (действия, раздачи, раскладки, 13)"""
+        num_actions = len(bases)
+        count, needed = cards.shape
+        completions = self.completions if needed > 1 else 1
+
+        # Случайные раскладки общие для всех действий: (count, completions, needed)
+        order = rng.random((count, completions, needed)).argsort(axis=2)
+        placed = np.take_along_axis(np.broadcast_to(cards[:, None, :], order.shape), order, axis=2)
+
+        boards = np.broadcast_to(bases[:, None, None, :], (num_actions, count, completions, 13)).copy()
+        if needed:
+            np.put_along_axis(boards, np.broadcast_to(empty[:, None, None, :], (num_actions,) + order.shape),
+                              np.broadcast_to(placed, (num_actions,) + order.shape), axis=3)
+        return boards
+
+    def _add_totals(self, totals: np.ndarray, result: Dict[str, np.ndarray], shape: Tuple[int, ...]) -> None:
+        """Добавляет к итогам действий лучшую раскладку каждой раздачи (при completions=1 - единственную)"""
+        foul = result['foul']
+        strength = HandEvaluator.hand_strength_batch(result['strengths']) * ~foul
+        royalties = result['royalties'].sum(axis=1)
+        fantasy = result['fantasy']
+        ev = np.where(foul, -self.foul_penalty, strength + royalties + self.fantasy_bonus * fantasy)
+
+        best = ev.reshape(shape).argmax(axis=2)[:, :, None]
+
+        def pick(values: np.ndarray) -> np.ndarray:
+            return np.take_along_axis(values.reshape(shape), best, axis=2)[:, :, 0]
+
+        best_ev = pick(ev)
+
+        totals[:, 0] += shape[1]
+        totals[:, 1] += best_ev.sum(axis=1)
+        totals[:, 2] += (best_ev ** 2).sum(axis=1)
+        totals[:, 3] += pick(strength).sum(axis=1)
+        totals[:, 4] += pick(royalties).sum(axis=1)
+        totals[:, 5] += pick(foul).sum(axis=1)
+        totals[:, 6] += pick(fantasy).sum(axis=1)
+
+    def _summary(self, row: np.ndarray) -> Dict:
+        n = row[0]
+        if not n:
+            return {'ev': 0.0, 'stderr': 0.0, 'strength': 0.0, 'royalties': 0.0,
+                    'foul': 0.0, 'fantasy': 0.0, 'samples': 0}
+        mean = row[1] / n
+        variance = max(row[2] / n - mean ** 2, 0.0)
+        return {
+            'ev': float(mean),
+            'stderr': float(np.sqrt(variance / n)),
+            'strength': float(row[3] / n),
+            'royalties': float(row[4] / n),
+            'foul': float(row[5] / n),
+            'fantasy': float(row[6] / n),
+            'samples': int(n)
+        }
@@ -0,0 +1,382 @@
+# ai/strategy_store.py
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .key_index import LazyKeyIndex
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # Лимит памяти таблиц по умолчанию (512 МБ)
+
+class StrategyStore:
+    """
+    Компактное хранилище сожалений и накопленных стратегий
+
+    Каждому информационному набору выдается целочисленный индекс строки.
+    Строка - непрерывный отрезок слотов действий в общих массивах float32
+    regrets и strategy_sum; offsets и widths задают начало и ширину строки.
+    Флаги dirty отмечают строки, измененные с последнего сохранения.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+                 initial_rows: int = 1024, initial_slots: int = 16384):
+        self.max_bytes = max_bytes
+        self.index: Dict[str, int] = {}
+
+        self.offsets = np.zeros(initial_rows, dtype=np.int64)
+        self.widths = np.zeros(initial_rows, dtype=np.int32)
+        self.dirty = np.zeros(initial_rows, dtype=bool)
+        self.regrets = np.zeros(initial_slots, dtype=np.float32)
+        self.strategy_sum = np.zeros(initial_slots, dtype=np.float32)
+
+        self.num_rows = 0
+        self.num_slots = 0
+
+        # Запись изменений (track_changes): исходные значения затронутых строк и новые ключи
+        self._original: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None
+        self._new_keys: List[str] = []
+        self._base_rows = 0
+        self._base_slots = 0
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    @property
+    def nbytes(self) -> int:
+        """Объем памяти, занятой массивами хранилища"""
+        return (self.offsets.nbytes + self.widths.nbytes +
+                self.regrets.nbytes + self.strategy_sum.nbytes)
+
+    def lookup(self, key: str) -> int:
+        """Возвращает индекс строки или -1, если набор еще не встречался"""
+        return self.index.get(key, -1)
+
+    def get_or_create(self, key: str, num_actions: int) -> int:
+        """Возвращает индекс строки, создавая её; -1 если достигнут лимит памяти"""
+        row = self.index.get(key, -1)
+        if row >= 0:
+            return row
+
+        if self.num_rows == len(self.offsets):
+            if not self._grow_rows():
+                return -1
+        if self.num_slots + num_actions > len(self.regrets):
+            if not self._grow_slots(num_actions):
+                return -1
+
+        row = self.num_rows
+        self.offsets[row] = self.num_slots
+        self.widths[row] = num_actions
+        self.dirty[row] = True
+        self.num_rows += 1
+        self.num_slots += num_actions
+        self.index[key] = row
+        if self._original is not None:
+            self._new_keys.append(key)
+        return row
+
+    def row_slice(self, row: int) -> slice:
+        """Срез слотов действий строки в общих массивах"""
+        start = int(self.offsets[row])
+        return slice(start, start + int(self.widths[row]))
+
+    def current_strategy(self, row: int, num_actions: int) -> np.ndarray:
+        """Текущая стратегия по regret matching (равномерная для неизвестных наборов)"""
+        if num_actions == 0:
+            return np.zeros(0)
+        if row < 0:
+            return np.full(num_actions, 1.0 / num_actions)
+
+        positive = np.maximum(self.regrets[self.row_slice(row)], 0.0).astype(np.float64)
+        total = positive.sum()
+        if total > 0:
+            return positive / total
+        return np.full(num_actions, 1.0 / num_actions)
+
+    def average_strategy(self, row: int) -> np.ndarray:
+        """Средняя стратегия по накопленным суммам"""
+        sums = self.strategy_sum[self.row_slice(row)].astype(np.float64)
+        if len(sums) == 0:
+            return sums
+        total = sums.sum()
+        if total > 0:
+            return sums / total
+        return np.full(len(sums), 1.0 / len(sums))
+
+    def add_regrets(self, row: int, deltas: np.ndarray) -> None:
+        """Добавляет приращения сожалений к строке"""
+        if self._original is not None and not self.dirty[row]:
+            self._remember(row)
+        self.regrets[self.row_slice(row)] += deltas
+        self.dirty[row] = True
+
+    def add_strategy(self, row: int, weights: np.ndarray) -> None:
+        """Добавляет взвешенную стратегию к накопленной сумме строки"""
+        if self._original is not None and not self.dirty[row]:
+            self._remember(row)
+        self.strategy_sum[self.row_slice(row)] += weights
+        self.dirty[row] = True
+
+    def average_positive_regret(self, iterations: int) -> float:
+        """
+        Сумма по наборам максимального положительного накопленного сожаления на итерацию
+
+        Это показатель хода тренировки, а не эксплуатируемость: при outcome
+        sampling сожаления взвешены обратной вероятностью выборки, поэтому
+        значение - в очках, умноженных на эти веса, и может расти вместе с
+        числом посещенных наборов. Сравнивать имеет смысл только значения
+        одного режима тренировки во времени.
+        """
+        if iterations <= 0 or self.num_rows == 0:
+            return 0.0
+        regrets = self.regrets[:self.num_slots]
+        row_max = np.maximum.reduceat(regrets, self.offsets[:self.num_rows])
+        return float(np.maximum(row_max, 0.0).sum()) / iterations
+
+    def to_dict(self) -> Dict:
+        """Сериализует хранилище в JSON-совместимый словарь"""
+        keys = [None] * self.num_rows
+        for key, row in self.index.items():
+            keys[row] = key
+        return {
+            'keys': keys,
+            'widths': self.widths[:self.num_rows].tolist(),
+            'regrets': self.regrets[:self.num_slots].tolist(),
+            'strategy_sum': self.strategy_sum[:self.num_slots].tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, max_bytes: Optional[int] = DEFAULT_MAX_BYTES) -> 'StrategyStore':
+        """Восстанавливает хранилище из словаря to_dict"""
+        widths = np.asarray(data.get('widths', []), dtype=np.int32)
+        store = cls(max_bytes=max_bytes,
+                    initial_rows=max(len(widths), 1),
+                    initial_slots=max(int(widths.sum()), 1))
+        store.num_rows = len(widths)
+        store.num_slots = int(widths.sum())
+        store.widths[:store.num_rows] = widths
+        store.offsets[:store.num_rows] = np.cumsum(widths) - widths
+        store.regrets[:store.num_slots] = data.get('regrets', [])
+        store.strategy_sum[:store.num_slots] = data.get('strategy_sum', [])
+        store.index = {key: row for row, key in enumerate(data.get('keys', []))}
+        return store
+
+    def to_arrays(self, changed_only: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Массивы для бинарной контрольной точки (ключи - байты, разделенные переводом строки)
+
+        Args:
+            changed_only: Только строки, измененные с последнего сохранения
+                          (дельта для apply_arrays)
+        """
+        keys = [None] * self.num_rows
+        for key, row in self.index.items():
+            keys[row] = key
+
+        if not changed_only:
+            # Смещения ключей и их порядок позволяют искать ключ без загрузки всех ключей
+            key_lengths = np.fromiter((len(key.encode()) + 1 for key in keys), dtype=np.int64,
+                                      count=self.num_rows)
+            return {
+                'keys': np.frombuffer('\n'.join(keys).encode(), dtype=np.uint8),
+                'key_offsets': np.concatenate([[0], np.cumsum(key_lengths)]).astype(np.int64),
+                'key_order': np.array(sorted(range(self.num_rows), key=keys.__getitem__), dtype=np.int64),
+                'offsets': self.offsets[:self.num_rows],
+                'widths': self.widths[:self.num_rows],
+                'regrets': self.regrets[:self.num_slots],
+                'strategy_sum': self.strategy_sum[:self.num_slots]
+            }
+
+        rows = np.flatnonzero(self.dirty[:self.num_rows])
+        slots = self._row_slots(rows)
+        return {
+            'keys': np.frombuffer('\n'.join(keys[row] for row in rows).encode(), dtype=np.uint8),
+            'widths': self.widths[rows],
+            'regrets': self.regrets[slots],
+            'strategy_sum': self.strategy_sum[slots]
+        }
+
+    def apply_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        """Записывает значения строк дельты to_arrays(changed_only=True), создавая новые строки"""
+        widths = np.asarray(arrays['widths'], dtype=np.int32)
+        if len(widths) == 0:
+            return
+
+        keys = bytes(arrays['keys']).decode().split('\n')
+        rows = np.array([self.get_or_create(key, int(width)) for key, width in zip(keys, widths)],
+                        dtype=np.int64)
+
+        # Строки, не поместившиеся в лимит памяти, пропускаются
+        kept = np.repeat(rows >= 0, widths)
+        slots = self._row_slots(rows[rows >= 0])
+        self.regrets[slots] = np.asarray(arrays['regrets'])[kept]
+        self.strategy_sum[slots] = np.asarray(arrays['strategy_sum'])[kept]
+        self.dirty[rows[rows >= 0]] = True
+
+    def clear_dirty(self) -> None:
+        """Сбрасывает отметки изменений (после сохранения)"""
+        self.dirty[:] = False
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray],
+                    max_bytes: Optional[int] = DEFAULT_MAX_BYTES) -> 'StrategyStore':
+        """
+        Восстанавливает хранилище из массивов to_arrays без копирования данных
+
+        Массивы сожалений и стратегий используются как есть (в том числе
+        отображенные в память); копия создается только при росте хранилища.
+        Если сохранены смещения и порядок ключей, индекс ключей ленивый.
+        """
+        widths = np.asarray(arrays['widths'], dtype=np.int32)
+        if len(widths) == 0:
+            return cls(max_bytes=max_bytes)
+
+        store = cls(max_bytes=max_bytes, initial_rows=1, initial_slots=1)
+        store.num_rows = len(widths)
+        store.num_slots = int(widths.sum())
+        store.widths = widths
+        if 'offsets' in arrays:
+            store.offsets = arrays['offsets']
+        else:
+            store.offsets = np.cumsum(widths, dtype=np.int64) - widths
+        store.regrets = arrays['regrets']
+        store.strategy_sum = arrays['strategy_sum']
+
+        store.dirty = np.zeros(store.num_rows, dtype=bool)
+
+        if 'key_order' in arrays:
+            store.index = LazyKeyIndex(arrays['keys'], arrays['key_offsets'], arrays['key_order'])
+        else:
+            keys = bytes(arrays['keys']).decode().split('\n')
+            store.index = {key: row for row, key in enumerate(keys)}
+        return store
+
+    def copy(self) -> 'StrategyStore':
+        """Копия хранилища без неиспользуемой емкости массивов"""
+        store = StrategyStore(max_bytes=self.max_bytes,
+                              initial_rows=max(self.num_rows, 1),
+                              initial_slots=max(self.num_slots, 1))
+        store.index = dict(self.index)
+        store.num_rows = self.num_rows
+        store.num_slots = self.num_slots
+        store.offsets[:self.num_rows] = self.offsets[:self.num_rows]
+        store.widths[:self.num_rows] = self.widths[:self.num_rows]
+        store.regrets[:self.num_slots] = self.regrets[:self.num_slots]
+        store.strategy_sum[:self.num_slots] = self.strategy_sum[:self.num_slots]
+        return store
+
+    def track_changes(self) -> None:
+        """
+        Начинает запись изменений для changes и rollback
+
+        Исходные значения строки запоминаются при первом её изменении, поэтому
+        затраты пропорциональны числу затронутых строк, а не размеру хранилища.
+        Отметки dirty при этом используются как признак "строка уже запомнена".
+        """
+        self.clear_dirty()
+        self._original = {}
+        self._new_keys = []
+        self._base_rows = self.num_rows
+        self._base_slots = self.num_slots
+
+    def changes(self) -> Dict:
+        """
+        Разреженные приращения с начала записи (для merge)
+
+        Returns:
+            Dict: 'base_rows' - число строк в начале записи; 'rows' - измененные
+            старые строки; 'keys' и 'widths' - новые строки; 'regrets' и
+            'strategy_sum' - приращения старых строк, затем значения новых
+        """
+        rows = np.array(sorted(self._original), dtype=np.int64)
+        slots = self._row_slots(rows)
+        regrets = [self.regrets[slots]]
+        strategy_sum = [self.strategy_sum[slots]]
+        if len(rows):
+            regrets[0] -= np.concatenate([self._original[row][0] for row in rows])
+            strategy_sum[0] -= np.concatenate([self._original[row][1] for row in rows])
+        regrets.append(self.regrets[self._base_slots:self.num_slots])
+        strategy_sum.append(self.strategy_sum[self._base_slots:self.num_slots])
+        return {
+            'base_rows': self._base_rows,
+            'rows': rows,
+            'keys': list(self._new_keys),
+            'widths': self.widths[self._base_rows:self.num_rows].copy(),
+            'regrets': np.concatenate(regrets),
+            'strategy_sum': np.concatenate(strategy_sum)
+        }
+
+    def rollback(self) -> None:
+        """Отменяет изменения с начала записи и прекращает запись"""
+        for row, (regrets, strategy_sum) in self._original.items():
+            span = self.row_slice(row)
+            self.regrets[span] = regrets
+            self.strategy_sum[span] = strategy_sum
+        for key in self._new_keys:
+            del self.index[key]
+        # Слоты за концом хранилища должны быть нулевыми для новых строк
+        self.regrets[self._base_slots:self.num_slots] = 0.0
+        self.strategy_sum[self._base_slots:self.num_slots] = 0.0
+        self.num_rows = self._base_rows
+        self.num_slots = self._base_slots
+        self.clear_dirty()
+        self._original = None
+        self._new_keys = []
+
+    def merge(self, delta: Dict) -> None:
+        """
+        Добавляет приращения changes, записанные от текущего состояния
+
+        Старые строки сопоставляются по индексу, поэтому хранилища источника и
+        получателя должны совпадать на момент начала записи; новые строки - по
+        ключу, их могли создать и другие источники.
+        """
+        rows = np.asarray(delta['rows'], dtype=np.int64)
+        slots = self._row_slots(rows)
+        self.regrets[slots] += delta['regrets'][:len(slots)]
+        self.strategy_sum[slots] += delta['strategy_sum'][:len(slots)]
+        self.dirty[rows] = True
+
+        start = len(slots)
+        for key, width in zip(delta['keys'], delta['widths']):
+            width = int(width)
+            row = self.get_or_create(key, width)
+            if row >= 0:
+                self.add_regrets(row, delta['regrets'][start:start + width])
+                self.add_strategy(row, delta['strategy_sum'][start:start + width])
+            start += width
+
+    def _remember(self, row: int) -> None:
+        """Запоминает исходные значения строки старше начала записи"""
+        if row < self._base_rows:
+            span = self.row_slice(row)
+            self._original[row] = (self.regrets[span].copy(), self.strategy_sum[span].copy())
+
+    def _fits(self, extra_bytes: int) -> bool:
+        return self.max_bytes is None or self.nbytes + extra_bytes <= self.max_bytes
+
+    def _grow_rows(self) -> bool:
+        """Удваивает емкость массивов строк"""
+        extra = len(self.offsets)
+        if not self._fits(extra * (self.offsets.itemsize + self.widths.itemsize)):
+            return False
+        self.offsets = np.concatenate([self.offsets, np.zeros(extra, dtype=np.int64)])
+        self.widths = np.concatenate([self.widths, np.zeros(extra, dtype=np.int32)])
+        self.dirty = np.concatenate([self.dirty, np.zeros(extra, dtype=bool)])
+        return True
+
+    def _row_slots(self, rows: np.ndarray) -> np.ndarray:
+        """Индексы слотов всех строк rows подряд"""
+        widths = self.widths[rows].astype(np.int64)
+        if len(widths) == 0:
+            return np.zeros(0, dtype=np.int64)
+        starts = np.repeat(self.offsets[rows] - (np.cumsum(widths) - widths), widths)
+        return starts + np.arange(int(widths.sum()))
+
+    def _grow_slots(self, needed: int) -> bool:
+        """Удваивает емкость массивов слотов (не меньше чем на needed)"""
+        extra = max(len(self.regrets), needed)
+        if not self._fits(extra * (self.regrets.itemsize + self.strategy_sum.itemsize)):
+            extra = needed
+            if not self._fits(extra * (self.regrets.itemsize + self.strategy_sum.itemsize)):
+                return False
+        self.regrets = np.concatenate([self.regrets, np.zeros(extra, dtype=np.float32)])
+        self.strategy_sum = np.concatenate([self.strategy_sum, np.zeros(extra, dtype=np.float32)])
+        return True
@@ -0,0 +1,139 @@
+# ai/training_jobs.py
+from typing import Dict, List, Optional, Callable
+import threading
+import time
+import uuid
+from .mccfr_agent import MCCFRAgent
+from .parallel_trainer import ParallelTrainer
+
+class TrainingJob:
+    """Фоновая тренировка одного агента с отслеживанием прогресса"""
+
+    STATUSES = ('queued', 'running', 'completed', 'cancelled', 'failed')
+
+    def __init__(self, agent: MCCFRAgent, iterations: int, mode: str = 'outcome',
+                 processes: Optional[int] = None,
+                 on_progress: Optional[Callable[[int], None]] = None,
+                 on_finish: Optional[Callable[['TrainingJob'], None]] = None):
+        self.job_id = uuid.uuid4().hex
+        self.agent = agent
+        self.iterations = iterations
+        self.mode = mode
+        self.processes = processes
+        self.on_progress = on_progress  # Получает число новых итераций после каждого раунда
+        self.on_finish = on_finish
+
+        self.status = 'queued'
+        self.completed = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def cancel(self) -> None:
+        """Запрашивает остановку; тренировка прервется после текущего раунда"""
+        self._cancel.set()
+
+    def to_dict(self) -> Dict:
+        """Состояние задачи для API"""
+        elapsed = 0.0
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+
+        eta = None
+        if self.status == 'running' and rate > 0:
+            eta = (self.iterations - self.completed) / rate
+
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'mode': self.mode,
+            'iterations': self.iterations,
+            'completed': self.completed,
+            'elapsed': elapsed,
+            'iterations_per_sec': rate,
+            'eta_seconds': eta,
+            'average_positive_regret': self.agent.store.average_positive_regret(self.agent.iterations),
+            'error': self.error
+        }
+
+    def _progress(self, done: int) -> bool:
+        if self.on_progress:
+            self.on_progress(done - self.completed)
+        self.completed = done
+        return not self._cancel.is_set()
+
+    def _run(self) -> None:
+        self.status = 'running'
+        self.started_at = time.time()
+        try:
+            trainer = ParallelTrainer(self.agent, processes=self.processes)
+            trainer.train(self.iterations, mode=self.mode, callback=self._progress)
+            self.status = 'cancelled' if self._cancel.is_set() else 'completed'
+        except Exception as e:
+            self.status = 'failed'
+            self.error = str(e)
+            print(f"Error in training job {self.job_id}: {e}")
+        finally:
+            self.finished_at = time.time()
+
+        if self.on_finish and self.completed:
+            try:
+                self.on_finish(self)
+            except Exception as e:
+                print(f"Error finishing training job {self.job_id}: {e}")
+
+class TrainingJobManager:
+    """Реестр фоновых задач тренировки: не больше одной активной задачи на агента"""
+
+    def __init__(self, max_finished: int = 20):
+        self.max_finished = max_finished  # Сколько завершенных задач хранить
+        self.jobs: Dict[str, TrainingJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, agent: MCCFRAgent, iterations: int, mode: str = 'outcome',
+               processes: Optional[int] = None,
+               on_progress: Optional[Callable[[int], None]] = None,
+               on_finish: Optional[Callable[[TrainingJob], None]] = None) -> Optional[TrainingJob]:
+        """Запускает задачу; None, если агент уже тренируется"""
+        if mode not in MCCFRAgent.TRAINING_MODES:
+            raise ValueError(f"Unknown training mode: {mode}")
+
+        with self._lock:
+            if any(job.agent is agent and job.active for job in self.jobs.values()):
+                return None
+            self._prune()
+            job = TrainingJob(agent, iterations, mode, processes, on_progress, on_finish)
+            self.jobs[job.job_id] = job
+        job.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[TrainingJob]:
+        return sorted(self.jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[TrainingJob]:
+        job = self.jobs.get(job_id)
+        if job:
+            job.cancel()
+        return job
+
+    def _prune(self) -> None:
+        """Удаляет самые старые завершенные задачи сверх лимита"""
+        finished = sorted((job for job in self.jobs.values() if not job.active),
+                          key=lambda job: job.created_at)
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job.job_id]
@@ -0,0 +1,111 @@
+# ai/transposition.py
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+import random
+import threading
+from .cards import NUM_CARDS
+from .isomorphism import canonical_suit_map
+
+# Группы карт доски: top, middle, bottom, рука, видимые карты
+NUM_GROUPS = 5
+
+# Случайные 64-битные числа Зобриста для каждой пары (группа, карта); порядок
+# карт внутри линии на оценку не влияет, поэтому хеш берется по линиям, а не по слотам
+_rng = random.Random(0x0FC0FFEE)
+ZOBRIST = tuple(tuple(_rng.getrandbits(64) for _ in range(NUM_CARDS)) for _ in range(NUM_GROUPS))
+
+def zobrist_hash(groups: Sequence[Sequence[int]]) -> int:
+    """Хеш групп карт: XOR чисел Зобриста (не зависит от порядка внутри группы)"""
+    value = 0
+    for table, cards in zip(ZOBRIST, groups):
+        for card in cards:
+            value ^= table[card]
+    return value
+
+def canonical_hash(groups: Sequence[Sequence[int]]) -> int:
+    """Хеш после канонической перенумерации мастей: изоморфные доски совпадают"""
+    mapping = canonical_suit_map(groups)
+    value = 0
+    for table, cards in zip(ZOBRIST, groups):
+        for card in cards:
+            value ^= table[(card & ~3) | mapping[card & 3]]
+    return value
+
+class TranspositionCache:
+    """
+    Ограниченный кэш с вытеснением по алгоритму CLOCK
+
+    Записи лежат в кольце фиксированного размера; обращение ставит записи бит
+    использования, а стрелка при вставке в полный кэш снимает биты и вытесняет
+    первую запись без него. Это приближение LRU без перестановок при чтении.
+    Доступ защищен блокировкой, поэтому кэш можно делить между потоками сервера.
+    """
+
+    def __init__(self, capacity: int = 1 << 16):
+        self.capacity = capacity
+        self.keys: List[Optional[Hashable]] = [None] * capacity
+        self.values: List[Any] = [None] * capacity
+        self.referenced = bytearray(capacity)
+        self.slots: Dict[Hashable, int] = {}
+        self.hand = 0  # Стрелка CLOCK
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            slot = self.slots.get(key)
+            if slot is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.referenced[slot] = 1
+            return self.values[slot]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            slot = self.slots.get(key)
+            if slot is None:
+                slot = self._free_slot()
+                self.keys[slot] = key
+                self.slots[key] = slot
+            self.values[slot] = value
+            self.referenced[slot] = 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.keys = [None] * self.capacity
+            self.values = [None] * self.capacity
+            self.referenced = bytearray(self.capacity)
+            self.slots.clear()
+            self.hand = 0
+
+    def stats(self) -> Dict:
+        """Размер и счетчики попаданий"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.slots),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def _free_slot(self) -> int:
+        if len(self.slots) < self.capacity:
+            return len(self.slots)
+
+        # Стрелка снимает биты использования, пока не найдет запись без него
+        while self.referenced[self.hand]:
+            self.referenced[self.hand] = 0
+            self.hand = (self.hand + 1) % self.capacity
+        slot = self.hand
+        del self.slots[self.keys[slot]]
+        self.evictions += 1
+        self.hand = (self.hand + 1) % self.capacity
+        return slot
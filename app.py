@@ -2,10 +2,21 @@ from flask import Flask, render_template, jsonify, session, request
 import random 
 import os
 from ai.mccfr_agent import MCCFRAgent
+from ai.training_jobs import TrainingJobManager
 from ai.game_rules import PineappleRules
+from ai.game_state import GameState
+from ai.rollout import RolloutEngine
+from ai.transposition import TranspositionCache
+from ai.isomorphism import LINES, LINE_SIZES
+from ai.cards import NUM_CARDS, cards_to_json, card_to_str, card_to_dict, to_card
 from storage.github_storage import GitHubStorage
-import json
-from typing import Dict, List
+from storage.local_storage import LocalStorage
+from storage.persistence import PersistenceManager
+from storage.game_sessions import FileGameSessionStore
+import atexit
+import threading
+import time
+from typing import Dict, List, Optional
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
@@ -14,60 +25,158 @@ app.secret_key = os.urandom(24)
 rules = PineappleRules()
 standard_agent = MCCFRAgent(progressive=False)
 progressive_agent = MCCFRAgent(progressive=True)
-storage = GitHubStorage()
+training_jobs = TrainingJobManager()
 
-# Загрузка сохраненного состояния ИИ
+def ai_state_snapshot(delta: bool = False) -> Dict[str, bytes]:
+    """Контрольные точки обоих агентов (полные или только изменения)"""
+    return {
+        'standard': standard_agent.save_state(delta=delta),
+        'progressive': progressive_agent.save_state(delta=delta)
+    }
+
+# Режим только для вывода: агенты заморожены, состояние не пишется и не тренируется.
+# Рассчитан на gunicorn --preload: стратегия загружается один раз до fork,
+# и рабочие процессы разделяют её страницы памяти.
+INFERENCE_ONLY = os.getenv('AI_INFERENCE_ONLY', '').lower() in ('1', 'true', 'yes')
+
+# GitHub - необязательная удаленная копия, основное хранилище локальное
+remote_storage = None
+if os.getenv('AI_PROGRESS_TOKEN') and not INFERENCE_ONLY:
+    try:
+        remote_storage = GitHubStorage()
+    except Exception as e:
+        print(f"Error connecting to GitHub storage: {e}")
+
+local_storage = LocalStorage()
+persistence = None
+if not INFERENCE_ONLY:
+    persistence = PersistenceManager(
+        local_storage,
+        ai_state_snapshot,
+        remote=remote_storage,
+        interval=float(os.getenv('AI_SAVE_INTERVAL', 60)),
+        max_updates=int(os.getenv('AI_SAVE_AFTER_UPDATES', 10000))
+    )
+    atexit.register(persistence.stop)
+
+def load_ai_state(state_data: Dict) -> None:
+    """Загружает агентов; локальные контрольные точки отображаются в память лениво"""
+    if 'standard' in state_data:
+        standard_agent.load_state(state_data['standard'])
+    if 'progressive' in state_data:
+        progressive_agent.load_state(state_data['progressive'])
+
+def fetch_remote_ai_state() -> None:
+    """Скачивает состояние с GitHub в фоне, если локальной копии нет"""
+    try:
+        state_data = persistence.fetch_remote()
+        if state_data:
+            load_ai_state(state_data)
+    except Exception as e:
+        print(f"Error fetching AI state: {e}")
+
+# Загрузка сохраненного состояния ИИ: старт не ждет сети
 try:
-    saved_state = storage.load_progress()
-    if saved_state:
-        state_data = json.loads(saved_state)
-        if 'standard' in state_data:
-            standard_agent.load_state(state_data['standard'])
-        if 'progressive' in state_data:
-            progressive_agent.load_state(state_data['progressive'])
+    state_data = local_storage.load_progress()
+    if state_data:
+        load_ai_state(state_data)
+    elif remote_storage is not None:
+        threading.Thread(target=fetch_remote_ai_state, daemon=True).start()
 except Exception as e:
     print(f"Error loading AI state: {e}")
 
-class Deck:
-    def __init__(self):
-        self.suits = ['♥', '♦', '♣', '♠']
-        self.ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-        self.cards = [{'suit': suit, 'rank': rank} for suit in self.suits for rank in self.ranks]
-        self.used_cards = []
-        random.shuffle(self.cards)
-    
-    def draw(self, count: int) -> List[Dict]:
-        if len(self.cards) < count:
-            return []
-        drawn_cards = [self.cards.pop() for _ in range(count)]
-        self.used_cards.extend(drawn_cards)
-        return drawn_cards
-
-def save_ai_progress():
-    """Сохраняет прогресс обоих агентов"""
-    state_data = {
-        'standard': standard_agent.save_state(),
-        'progressive': progressive_agent.save_state()
-    }
-    storage.save_progress(json.dumps(state_data))
+if INFERENCE_ONLY:
+    # Экспортированные политики компактнее таблиц сожалений: ход - одно чтение массива
+    for name, path in local_storage.load_policies().items():
+        agent = {'standard': standard_agent, 'progressive': progressive_agent}.get(name)
+        if agent is not None:
+            try:
+                agent.load_policy(path)
+            except Exception as e:
+                print(f"Error loading {name} policy: {e}")
+    standard_agent.freeze()
+    progressive_agent.freeze()
 
-@app.route('/')
-def home():
-    if 'game_state' not in session:
-        session['game_state'] = {
+# Партии хранятся на сервере в компактном виде, в cookie - только идентификатор.
+# Каталог общий для всех рабочих процессов gunicorn: запрос партии может попасть в любой
+game_sessions = FileGameSessionStore(os.getenv('GAME_SESSION_DIR', 'game_sessions'),
+                                     ttl=float(os.getenv('GAME_SESSION_TTL', 3600)))
+
+# Быстрая оценка риска мертвой руки после каждого размещения
+placement_rollout = RolloutEngine(samples=32, time_budget=0.05, cache=TranspositionCache(1 << 14))
+
+# Колода партии - перестановка 52 карт (байт на карту) и позиция следующей
+# карты: раздача - срез без пересборки колоды
+def shuffled_deck() -> bytes:
+    """Новая перемешанная колода в компактном виде"""
+    cards = list(range(NUM_CARDS))
+    random.SystemRandom().shuffle(cards)
+    return bytes(cards)
+
+def draw_from_deck(game: Dict, count: int) -> List[int]:
+    """Берет count карт с верха колоды партии за O(count)"""
+    position = game['deck_pos']
+    cards = list(game['deck'][position:position + count])
+    game['deck_pos'] = position + len(cards)
+    return cards
+
+def placed_cards(game: Dict) -> List[int]:
+    return [card for line in LINES for card in game['table'][line] if card is not None]
+
+def game_hand(game: Dict) -> List[int]:
+    """Карты на руке: розданные, но не выложенные и не сброшенные"""
+    out = set(placed_cards(game)) | set(game['discards'])
+    return [card for card in game['deck'][:game['deck_pos']] if card not in out]
+
+def discard_hand(game: Dict) -> List[int]:
+    """Отправляет в сброс карты, оставшиеся на руке после завершенной улицы"""
+    hand = game_hand(game)
+    game['discards'].extend(hand)
+    return hand
+
+def game_to_json(game: Optional[Dict]) -> Dict:
+    """Состояние партии в JSON-формате клиента"""
+    if game is None:
+        return {
             'hand': [],
-            'table': {
-                'top': [''] * 3,
-                'middle': [''] * 5,
-                'bottom': [''] * 5
-            },
+            'table': {line: [''] * LINE_SIZES[line] for line in LINES},
             'used_cards': [],
             'draw_count': 0,
             'initial_cards_placed': False,
             'fantasy_mode': False,
             'progressive': False
         }
-    return render_template('index.html', game_state=session['game_state'])
+    return {
+        'hand': cards_to_json(game_hand(game)),
+        'table': {line: [card_to_dict(card) if card is not None else '' for card in game['table'][line]]
+                  for line in LINES},
+        'used_cards': [card_to_str(card) for card in game['deck'][:game['deck_pos']]],
+        'draw_count': game['draw_count'],
+        'initial_cards_placed': game['initial_cards_placed'],
+        'fantasy_mode': game['fantasy_mode'],
+        'progressive': game['progressive']
+    }
+
+@app.before_request
+def drop_legacy_game_state():
+    """
+    Удаляет состояние партии из старых cookie
+
+    Раньше cookie хранила всё состояние вместе с колодой; подписанная cookie
+    не шифруется, поэтому клиент мог прочитать будущие карты.
+    """
+    if 'game_state' in session:
+        session.pop('game_state')
+
+def current_game():
+    """Идентификатор и запись текущей партии (из cookie или параметра game_id)"""
+    game_id = request.args.get('game_id') or session.get('game_id')
+    return game_id, game_sessions.get(game_id)
+
+@app.route('/')
+def home():
+    _, game = current_game()
+    return render_template('index.html', game_state=game_to_json(game))
 
 @app.route('/training')
 def training():
@@ -75,112 +184,345 @@ def training():
 
 @app.route('/start')
 def start_game():
-    deck = Deck()
-    initial_cards = deck.cards[:5]
-    
-    game_state = {
-        'hand': initial_cards,
-        'table': {
-            'top': [''] * 3,
-            'middle': [''] * 5,
-            'bottom': [''] * 5
-        },
-        'used_cards': [f"{card['rank']}{card['suit']}" for card in initial_cards],
+    game = {
+        'deck': shuffled_deck(),
+        'deck_pos': 0,
+        'table': {line: [None] * LINE_SIZES[line] for line in LINES},
+        'discards': [],
         'draw_count': 0,
         'initial_cards_placed': False,
         'fantasy_mode': False,
         'progressive': request.args.get('progressive', 'false').lower() == 'true'
     }
+    initial_json = cards_to_json(draw_from_deck(game, 5))
     
-    session['game_state'] = game_state
-    return jsonify({'cards': initial_cards})
+    game_id = game_sessions.create(game)
+    session['game_id'] = game_id
+    return jsonify({'cards': initial_json, 'game_id': game_id})
 
 @app.route('/draw')
 def draw_cards():
-    game_state = session.get('game_state', {})
+    game_id, game = current_game()
+    if game is None:
+        return jsonify({'cards': [], 'error': 'Начните новую игру!'}), 400
     
-    if not game_state.get('initial_cards_placed'):
+    if not game['initial_cards_placed']:
         return jsonify({'cards': [], 'error': 'Сначала распределите начальные карты!'})
     
-    if game_state.get('draw_count', 0) >= 4:
+    if game['draw_count'] >= 4:
         return jsonify({'cards': [], 'error': 'Больше карт взять нельзя!'})
     
-    deck = Deck()
-    used_cards = game_state.get('used_cards', [])
-    available_cards = [card for card in deck.cards 
-                      if f"{card['rank']}{card['suit']}" not in used_cards]
+    # Улица из трех карт завершается новой раздачей: две карты выложены,
+    # третья уходит в сброс
+    discarded = []
+    if game['draw_count'] > 0:
+        if len(game_hand(game)) > 1:
+            return jsonify({'cards': [], 'error': 'Сначала разместите две карты!'})
+        discarded = discard_hand(game)
     
     cards_to_draw = 3
-    if game_state.get('fantasy_mode'):
-        if game_state.get('progressive'):
-            fantasy_type = rules.check_fantasy(game_state['table']['top'])
-            cards_to_draw = fantasy_type['extra_cards'] - len(game_state['hand'])
+    if game['fantasy_mode']:
+        hand_size = len(game_hand(game))
+        if game['progressive']:
+            fantasy_type = rules.check_fantasy([card for card in game['table']['top'] if card is not None])
+            cards_to_draw = fantasy_type['extra_cards'] - hand_size
         else:
-            cards_to_draw = 14 - len(game_state['hand'])
+            cards_to_draw = 14 - hand_size
     
-    next_cards = available_cards[:cards_to_draw]
+    if cards_to_draw <= 0:
+        return jsonify({'cards': [], 'error': 'Больше карт взять нельзя!'})
+    if game['deck_pos'] + cards_to_draw > NUM_CARDS:
+        return jsonify({'cards': [], 'error': 'В колоде не осталось карт!'})
     
-    game_state['hand'].extend(next_cards)
-    game_state['used_cards'].extend([f"{card['rank']}{card['suit']}" for card in next_cards])
-    game_state['draw_count'] = game_state.get('draw_count', 0) + 1
+    next_json = cards_to_json(draw_from_deck(game, cards_to_draw))
+    game['draw_count'] += 1
     
-    session['game_state'] = game_state
-    return jsonify({'cards': next_cards})
+    game_sessions.put(game_id, game)
+    return jsonify({'cards': next_json, 'discarded': cards_to_json(discarded)})
 
 @app.route('/update_state', methods=['POST'])
 def update_state():
+    """
+    Принимает изменения стола: только переданные линии (слоты, '' - пусто)
+
+    Рука, колода и счетчики принадлежат серверу; полное состояние старого
+    формата тоже принимается, но из него читается только стол.
+    """
     if not request.is_json:
         return jsonify({'error': 'Content type must be application/json'}), 400
     
-    game_state = request.get_json()
-    
-    if not isinstance(game_state, dict):
+    delta = request.get_json()
+    if not isinstance(delta, dict) or not isinstance(delta.get('table', {}), dict):
         return jsonify({'error': 'Invalid game state format'}), 400
     
-    required_keys = ['hand', 'table', 'used_cards', 'draw_count', 'initial_cards_placed']
-    if not all(key in game_state for key in required_keys):
-        return jsonify({'error': 'Missing required game state fields'}), 400
+    game_id, game = current_game()
+    if game is None:
+        return jsonify({'error': 'Game not found'}), 404
+    
+    try:
+        for line, slots in delta.get('table', {}).items():
+            if line not in LINE_SIZES or len(slots) != LINE_SIZES[line]:
+                raise ValueError(f'Invalid line: {line}')
+            game['table'][line] = [to_card(card) if card or card == 0 else None for card in slots]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid table: {e}'}), 400
+    
+    # На столе могут быть только розданные карты, каждая один раз
+    placed = placed_cards(game)
+    dealt = set(game['deck'][:game['deck_pos']]) - set(game['discards'])
+    if len(set(placed)) != len(placed) or not set(placed) <= dealt:
+        return jsonify({'error': 'Invalid table: unknown or duplicate cards'}), 400
+    
+    if len(placed) >= 5:
+        game['initial_cards_placed'] = True
+    # Стол заполнен - последняя улица завершена, остаток руки сброшен
+    if len(placed) == 13:
+        discard_hand(game)
     
     # Проверяем возможность фантазии
-    if game_state['initial_cards_placed'] and not game_state.get('fantasy_mode'):
-        fantasy_check = rules.check_fantasy(game_state['table']['top'])
+    if game['initial_cards_placed'] and not game['fantasy_mode']:
+        fantasy_check = rules.check_fantasy([card for card in game['table']['top'] if card is not None])
         if fantasy_check['fantasy']:
-            game_state['fantasy_mode'] = True
+            game['fantasy_mode'] = True
     
-    session['game_state'] = game_state
-    return jsonify({'status': 'success'})
+    game_sessions.put(game_id, game)
+    return jsonify({'status': 'success', 'fantasy_mode': game['fantasy_mode']})
 
-@app.route('/ai_move', methods=['POST'])
-def ai_move():
-    """Получает ход от ИИ"""
-    game_state = request.json
-    agent = progressive_agent if game_state.get('progressive') else standard_agent
+def foul_probability(game: Dict) -> float:
+    """Вероятность мертвой руки при доборе оставшихся карт"""
+    table = {line: [card for card in game['table'][line] if card is not None] for line in LINES}
+    state = GameState.from_cards(table, visible_cards=game['discards'])
+    if not state.placed:
+        return 0.0
+    return placement_rollout.evaluate_actions(state, [{}])[0]['foul']
+
+@app.route('/place', methods=['POST'])
+def place_card():
+    """
+    Один ход перетаскивания: карта в слот линии или обратно на руку
+
+    Запрос: {'card', 'line': 'top'|'middle'|'bottom'|'hand', 'slot'}. Проверяется
+    только перемещаемая карта и целевой слот; занявшая слот карта уходит на
+    руку. Ответ содержит только изменения: перемещение, вытесненную карту,
+    срабатывание фантазии и вероятность мертвой руки.
+    """
+    move = request.get_json(silent=True)
+    if not isinstance(move, dict):
+        return jsonify({'error': 'Content type must be application/json'}), 400
+    
+    game_id, game = current_game()
+    if game is None:
+        return jsonify({'error': 'Game not found'}), 404
+    
+    try:
+        card = to_card(move['card'])
+        line = move['line']
+        slot = int(move.get('slot', 0))
+    except (KeyError, TypeError, ValueError) as e:
+        # to_card отклоняет и номера карт вне колоды
+        return jsonify({'error': f'Invalid move: {e}'}), 400
+    
+    if line != 'hand' and (line not in LINE_SIZES or not 0 <= slot < LINE_SIZES[line]):
+        return jsonify({'error': 'Invalid slot'}), 400
+    if card not in game['deck'][:game['deck_pos']] or card in game['discards']:
+        return jsonify({'error': 'Card is not in play'}), 400
     
-    # Обновляем знания ИИ о картах
-    agent.update_cards_knowledge(game_state.get('visible_cards', []))
+    # Снимаем карту с прежнего места и кладем в новый слот
+    for cards in game['table'].values():
+        if card in cards:
+            cards[cards.index(card)] = None
+    displaced = None
+    if line != 'hand':
+        displaced = game['table'][line][slot]
+        game['table'][line][slot] = card
+    
+    changes = {'card': card_to_dict(card), 'line': line, 'slot': slot,
+               'displaced': card_to_dict(displaced) if displaced is not None else None}
+    
+    if not game['initial_cards_placed'] and len(placed_cards(game)) >= 5:
+        game['initial_cards_placed'] = True
+        changes['initial_cards_placed'] = True
+    
+    if game['initial_cards_placed'] and not game['fantasy_mode']:
+        fantasy_check = rules.check_fantasy([c for c in game['table']['top'] if c is not None])
+        if fantasy_check['fantasy']:
+            game['fantasy_mode'] = True
+            changes['fantasy_mode'] = True
+            changes['fantasy_type'] = fantasy_check['type']
     
-    # Получаем ход от ИИ
-    action = agent.get_action(game_state)
+    if len(placed_cards(game)) == 13:
+        discarded = discard_hand(game)
+        if discarded:
+            changes['discarded'] = cards_to_json(discarded)
     
-    # Сохраняем прогресс
-    save_ai_progress()
+    changes['foul_probability'] = foul_probability(game)
     
-    return jsonify({'action': action})
+    game_sessions.put(game_id, game)
+    return jsonify(changes)
+
+def request_time_budget(data: Dict) -> Optional[float]:
+    """Необязательный лимит времени на ход из поля deadline_ms (в секундах)"""
+    deadline_ms = data.get('deadline_ms')
+    if deadline_ms is None:
+        return None
+    if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)) or deadline_ms <= 0:
+        raise ValueError('deadline_ms must be a positive number')
+    return deadline_ms / 1000
+
+@app.route('/ai_move', methods=['POST'])
+def ai_move():
+    """Получает ход от ИИ"""
+    game_state = request.get_json(silent=True)
+    if not isinstance(game_state, dict):
+        return jsonify({'error': 'Invalid game state format'}), 400
+    agent = progressive_agent if game_state.get('progressive') else standard_agent
+
+    # Необязательный лимит времени на ход: возвращается лучший ход, найденный за это время
+    try:
+        time_budget = request_time_budget(game_state)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Получаем ход от ИИ: знания о картах берутся только из запроса,
+    # таблицы стратегий не меняются, сохранять нечего
+    search: Dict = {}
+    try:
+        action = agent.get_action(game_state, time_budget=time_budget, stats=search)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid game state: {e}'}), 400
+
+    return jsonify({'action': action, 'search': search})
+
+@app.route('/ai_move_batch', methods=['POST'])
+def ai_move_batch():
+    """Ходы ИИ сразу для нескольких столов: кандидаты каждого агента оцениваются одним пакетом"""
+    data = request.get_json(silent=True)
+    game_states = data.get('game_states') if isinstance(data, dict) else None
+    if not isinstance(game_states, list) or not all(isinstance(state, dict) for state in game_states):
+        return jsonify({'error': 'Expected a list of game states'}), 400
+    try:
+        time_budget = request_time_budget(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    seed = data.get('seed')
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or seed < 0):
+        return jsonify({'error': 'seed must be a non-negative integer'}), 400
+    started = time.perf_counter()
+
+    # Группируем состояния по агентам, ответы возвращаем в порядке запроса;
+    # лимит времени делится между агентами поровну из оставшегося
+    groups = []
+    for progressive, agent in ((False, standard_agent), (True, progressive_agent)):
+        indices = [i for i, state in enumerate(game_states) if bool(state.get('progressive')) == progressive]
+        if indices:
+            groups.append((agent, indices))
+
+    actions = [None] * len(game_states)
+    errors = [None] * len(game_states)
+    search = {'candidates': 0, 'samples': 0, 'complete': True}
+    for n, (agent, indices) in enumerate(groups):
+        budget = None
+        if time_budget is not None:
+            budget = max(time_budget - (time.perf_counter() - started), 0.0) / (len(groups) - n)
+        # Ошибка в одном столе не прерывает пакет: у такого стола хода нет, есть сообщение
+        group_search: Dict = {}
+        group_errors: Dict[int, str] = {}
+        batch = agent.get_actions([game_states[i] for i in indices], seed=seed,
+                                  time_budget=budget, stats=group_search, errors=group_errors)
+        for position, i in enumerate(indices):
+            actions[i] = batch[position]
+            if position in group_errors:
+                errors[i] = f'Invalid game state: {group_errors[position]}'
+        search['candidates'] += group_search['candidates']
+        search['samples'] += group_search['samples']
+        search['complete'] = search['complete'] and group_search['complete']
+    search['elapsed'] = time.perf_counter() - started
+
+    return jsonify({'actions': actions, 'errors': errors, 'search': search})
+
+@app.route('/ai_cache', methods=['GET'])
+def ai_cache_stats():
+    """Статистика кэшей оценок ИИ в этом рабочем процессе"""
+    return jsonify({
+        'standard': standard_agent.cache_stats(),
+        'progressive': progressive_agent.cache_stats()
+    })
 
 @app.route('/train_ai', methods=['POST'])
 def train_ai():
-    """Тренировка ИИ"""
-    data = request.json
+    """Запускает фоновую тренировку ИИ и сразу возвращает идентификатор задачи"""
+    if INFERENCE_ONLY:
+        return jsonify({'error': 'Training is disabled in inference mode'}), 403
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Invalid request format'}), 400
     iterations = data.get('iterations', 1000)
     progressive = data.get('progressive', False)
+    mode = data.get('mode', 'outcome')
+    processes = data.get('processes')  # По умолчанию - все ядра
+    
+    if mode not in MCCFRAgent.TRAINING_MODES:
+        return jsonify({'error': f'Unknown training mode: {mode}'}), 400
+    if isinstance(iterations, bool) or not isinstance(iterations, int) or iterations < 1:
+        return jsonify({'error': 'iterations must be a positive integer'}), 400
+    if processes is not None and (isinstance(processes, bool) or not isinstance(processes, int) or processes < 1):
+        return jsonify({'error': 'processes must be a positive integer'}), 400
     
     agent = progressive_agent if progressive else standard_agent
-    agent.train(iterations)
     
-    # Сохраняем прогресс
-    save_ai_progress()
+    # Итерации отмечаются для отложенного сохранения, по завершении задачи - сразу
+    job = training_jobs.submit(agent, iterations, mode=mode, processes=processes,
+                               on_progress=persistence.mark_dirty,
+                               on_finish=lambda job: persistence.request_flush())
+    if job is None:
+        return jsonify({'error': 'Training is already running for this agent'}), 409
     
-    return jsonify({'status': 'success'})
+    return jsonify(job.to_dict()), 202
+
+@app.route('/export_policy', methods=['POST'])
+def export_policy():
+    """Экспортирует средние стратегии агентов для режима только вывода"""
+    if INFERENCE_ONLY:
+        return jsonify({'error': 'Export is disabled in inference mode'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        prune_threshold = float(data.get('prune_threshold', 0.01))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'prune_threshold must be a number'}), 400
+    if not prune_threshold >= 0:
+        return jsonify({'error': 'prune_threshold must be non-negative'}), 400
+    
+    policies = {
+        'standard': standard_agent.export_policy(prune_threshold=prune_threshold),
+        'progressive': progressive_agent.export_policy(prune_threshold=prune_threshold)
+    }
+    if not local_storage.save_policies(policies):
+        return jsonify({'error': 'Failed to save policies'}), 500
+    
+    return jsonify({'policies': {name: len(content) for name, content in policies.items()}})
+
+@app.route('/train_ai', methods=['GET'])
+def list_training_jobs():
+    """Список задач тренировки"""
+    return jsonify({'jobs': [job.to_dict() for job in training_jobs.list()]})
+
+@app.route('/train_ai/<job_id>', methods=['GET'])
+def training_job_status(job_id):
+    """Прогресс задачи тренировки: скорость, оценка эксплуатируемости и ETA"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/train_ai/<job_id>/cancel', methods=['POST'])
+def cancel_training_job(job_id):
+    """Отменяет задачу тренировки"""
+    job = training_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,52 @@
+# storage/checkpoint_files.py
+
+import re
+from typing import Dict, List, Iterable, Optional, Tuple
+
+# <агент>.<номер>.ckpt - базовая точка, <агент>.<номер>.delta - дельта после неё.
+# Файл <агент>.ckpt без номера (старый формат) считается базой с номером 0.
+_PATTERN = re.compile(r'^(?P<name>[A-Za-z0-9_]+)(?:\.(?P<seq>\d+))?\.(?P<kind>ckpt|delta)$')
+
+def checkpoint_filename(name: str, seq: int, delta: bool) -> str:
+    return f"{name}.{seq:08d}.{'delta' if delta else 'ckpt'}"
+
+def parse_checkpoint_filename(filename: str) -> Optional[Tuple[str, int, bool]]:
+    """(агент, номер, дельта ли) или None для посторонних файлов"""
+    match = _PATTERN.match(filename)
+    if not match:
+        return None
+    return match.group('name'), int(match.group('seq') or 0), match.group('kind') == 'delta'
+
+def next_sequence(filenames: Iterable[str], name: str) -> int:
+    """Следующий номер точки агента"""
+    seqs = [parsed[1] for parsed in map(parse_checkpoint_filename, filenames)
+            if parsed and parsed[0] == name]
+    return max(seqs, default=0) + 1
+
+def checkpoint_chains(filenames: Iterable[str]) -> Tuple[Dict[str, List[str]], List[str]]:
+    """
+    Цепочки восстановления по списку файлов
+
+    Returns:
+        Tuple: (агент -> [последняя база, дельты после неё по порядку],
+                устаревшие файлы, которые можно удалить)
+    """
+    entries: Dict[str, List[Tuple[int, bool, str]]] = {}
+    for filename in filenames:
+        parsed = parse_checkpoint_filename(filename)
+        if parsed:
+            name, seq, delta = parsed
+            entries.setdefault(name, []).append((seq, delta, filename))
+
+    chains = {}
+    obsolete = []
+    for name, items in entries.items():
+        bases = [seq for seq, delta, _ in items if not delta]
+        if not bases:
+            continue
+        base_seq = max(bases)
+        chain = sorted((seq, delta, filename) for seq, delta, filename in items
+                       if seq > base_seq or (seq == base_seq and not delta))
+        chains[name] = [filename for _, _, filename in chain]
+        obsolete += [filename for seq, _, filename in items if seq < base_seq]
+    return chains, obsolete
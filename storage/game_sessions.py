@@ -0,0 +1,214 @@
+# storage/game_sessions.py
+
+import os
+import re
+import secrets
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
+from ai.isomorphism import LINES, LINE_SIZES
+
+EMPTY_SLOT = 0xFF
+
+# Флаги, счетчик раздач, позиция в колоде, число сброшенных карт
+_HEADER = struct.Struct('<BBBB')
+_INITIAL_PLACED, _FANTASY, _PROGRESSIVE = 1, 2, 4
+
+def encode_game(game: Dict) -> bytes:
+    """
+    Компактная запись партии (около 70 байт)
+
+    Заголовок, перестановка колоды (52 байта), 13 слотов стола по байту
+    (EMPTY_SLOT - пустой) и сброшенные карты.
+    """
+    flags = ((_INITIAL_PLACED if game['initial_cards_placed'] else 0) |
+             (_FANTASY if game['fantasy_mode'] else 0) |
+             (_PROGRESSIVE if game['progressive'] else 0))
+    slots = [EMPTY_SLOT if card is None else card for line in LINES for card in game['table'][line]]
+    return (_HEADER.pack(flags, game['draw_count'], game['deck_pos'], len(game['discards'])) +
+            game['deck'] + bytes(slots) + bytes(game['discards']))
+
+def decode_game(data: bytes) -> Dict:
+    """Обратное преобразование encode_game"""
+    flags, draw_count, deck_pos, num_discards = _HEADER.unpack_from(data)
+    offset = _HEADER.size
+    deck = data[offset:offset + 52]
+    offset += 52
+    table = {}
+    for line in LINES:
+        table[line] = [None if card == EMPTY_SLOT else card
+                       for card in data[offset:offset + LINE_SIZES[line]]]
+        offset += LINE_SIZES[line]
+    return {
+        'deck': deck,
+        'deck_pos': deck_pos,
+        'table': table,
+        'discards': list(data[offset:offset + num_discards]),
+        'draw_count': draw_count,
+        'initial_cards_placed': bool(flags & _INITIAL_PLACED),
+        'fantasy_mode': bool(flags & _FANTASY),
+        'progressive': bool(flags & _PROGRESSIVE)
+    }
+
+class GameSessionStore:
+    def __init__(self, ttl: float = 3600.0, max_games: int = 10000):
+        """
+        Хранилище партий на сервере: идентификатор -> компактная запись
+
+        В cookie клиента остается только идентификатор партии. Партии, к
+        которым не обращались ttl секунд, вытесняются; при переполнении
+        вытесняются самые давние. Хранилище живет в памяти процесса и годится
+        только для одного рабочего процесса; при нескольких процессах gunicorn
+        нужно FileGameSessionStore.
+
+        Args:
+            ttl: Время жизни партии без обращений (сек)
+            max_games: Максимальное число хранимых партий
+        """
+        self.ttl = ttl
+        self.max_games = max_games
+        # Порядок - по последнему обращению: просроченные записи всегда в начале
+        self._games: 'OrderedDict[str, Tuple[float, bytes]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def create(self, game: Dict) -> str:
+        """Сохраняет новую партию и возвращает её идентификатор"""
+        game_id = secrets.token_urlsafe(12)
+        self.put(game_id, game)
+        return game_id
+
+    def get(self, game_id: Optional[str]) -> Optional[Dict]:
+        """Возвращает партию и продлевает её время жизни"""
+        if not game_id:
+            return None
+        with self._lock:
+            self._evict(time.time())
+            entry = self._games.get(game_id)
+            if entry is None:
+                return None
+            self._games[game_id] = (time.time() + self.ttl, entry[1])
+            self._games.move_to_end(game_id)
+        return decode_game(entry[1])
+
+    def put(self, game_id: str, game: Dict) -> None:
+        data = encode_game(game)
+        with self._lock:
+            self._games[game_id] = (time.time() + self.ttl, data)
+            self._games.move_to_end(game_id)
+            self._evict(time.time())
+
+    def delete(self, game_id: str) -> None:
+        with self._lock:
+            self._games.pop(game_id, None)
+
+    def _evict(self, now: float) -> None:
+        while self._games:
+            game_id, (expires, _) = next(iter(self._games.items()))
+            if expires > now and len(self._games) <= self.max_games:
+                break
+            del self._games[game_id]
+
+class FileGameSessionStore(GameSessionStore):
+    # Идентификаторы secrets.token_urlsafe; другие имена файлов не принимаются
+    GAME_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+    SUFFIX = '.game'
+
+    def __init__(self, directory: str, ttl: float = 3600.0, max_games: int = 10000,
+                 sweep_interval: float = 60.0):
+        """
+        Хранилище партий в общем каталоге: файл на партию
+
+        Его разделяют все рабочие процессы gunicorn на одной машине, поэтому
+        запрос партии может попасть в любой процесс. Запись атомарная (временный
+        файл и os.replace), время последнего обращения - mtime файла. Просроченные
+        и лишние партии удаляются при создании новых не чаще раза в sweep_interval
+        секунд.
+
+        Args:
+            directory: Каталог партий
+            ttl: Время жизни партии без обращений (сек)
+            max_games: Максимальное число хранимых партий
+            sweep_interval: Минимальный интервал между очистками каталога (сек)
+        """
+        super().__init__(ttl, max_games)
+        self.directory = directory
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(self.SUFFIX))
+
+    def create(self, game: Dict) -> str:
+        now = time.time()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            self._evict(now)
+        return super().create(game)
+
+    def get(self, game_id: Optional[str]) -> Optional[Dict]:
+        path = self._path(game_id)
+        if path is None:
+            return None
+        try:
+            if os.path.getmtime(path) + self.ttl <= time.time():
+                os.unlink(path)
+                return None
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Продлеваем время жизни
+        except OSError:
+            return None
+        return decode_game(data)
+
+    def put(self, game_id: str, game: Dict) -> None:
+        path = self._path(game_id)
+        if path is None:
+            raise ValueError(f"Invalid game id: {game_id}")
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(encode_game(game))
+            os.replace(tmp_path, path)
+        except:
+            os.unlink(tmp_path)
+            raise
+
+    def delete(self, game_id: str) -> None:
+        path = self._path(game_id)
+        if path is not None:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _path(self, game_id: Optional[str]) -> Optional[str]:
+        if not game_id or not self.GAME_ID.match(game_id):
+            return None
+        return os.path.join(self.directory, game_id + self.SUFFIX)
+
+    def _evict(self, now: float) -> None:
+        games = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    games.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        # Сначала самые давние: просроченные и всё сверх лимита
+        games.sort()
+        excess = max(0, len(games) - self.max_games)
+        for i, (mtime, path) in enumerate(games):
+            if i >= excess and mtime + self.ttl > now:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
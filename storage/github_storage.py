@@ -1,11 +1,12 @@
 # storage/github_storage.py
 
-from github import Github
+from github import Github, InputGitTreeElement
 import os
 import json
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Sequence
 import base64
+from .checkpoint_files import checkpoint_filename, checkpoint_chains, next_sequence
 
 class GitHubStorage:
     def __init__(self):
@@ -16,53 +17,58 @@ class GitHubStorage:
             
         self.repo_name = os.getenv('GITHUB_REPO', 'username/pineapple-poker')
         self.github = Github(self.token)
-        self.repo = self.github.get_repo(self.repo_name)
+        self.directory = "ai_progress"
+        self._repo = None
         
-    def save_progress(self, data: Dict[str, Any], commit_message: Optional[str] = None) -> bool:
+    @property
+    def repo(self):
+        """Репозиторий запрашивается при первом обращении, а не при создании хранилища"""
+        if self._repo is None:
+            self._repo = self.github.get_repo(self.repo_name)
+        return self._repo
+        
+    def save_progress(self, data: Optional[Dict[str, bytes]] = None,
+                      commit_message: Optional[str] = None,
+                      deltas: Sequence[Dict[str, bytes]] = ()) -> bool:
         """
-        Сохраняет прогресс ИИ на GitHub
+        Сохраняет контрольные точки агентов на GitHub одним коммитом
+        
+        Новая база заменяет предыдущие базу и дельты (уплотнение); дельты
+        добавляются к цепочке после текущей базы.
         
         Args:
-            data: Словарь с данными для сохранения
+            data: Имя агента -> байты базовой контрольной точки
             commit_message: Опциональное сообщение коммита
+            deltas: Дельты (имя агента -> байты) в порядке создания
             
         Returns:
             bool: Успешность операции
         """
         try:
-            # Подготовка данных
-            serialized_data = json.dumps(data, indent=2)
-            encoded_data = base64.b64encode(serialized_data.encode()).decode()
-            
             # Формирование сообщения коммита
             if not commit_message:
                 timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 commit_message = f"Update AI progress - {timestamp}"
                 
-            # Сохранение текущего состояния
-            try:
-                contents = self.repo.get_contents("ai_progress/current_state.json")
-                self.repo.update_file(
-                    contents.path,
-                    commit_message,
-                    serialized_data,
-                    contents.sha
-                )
-            except:
-                self.repo.create_file(
-                    "ai_progress/current_state.json",
-                    commit_message,
-                    serialized_data
-                )
+            existing = self._list_files(self.directory)
+            filenames = list(existing)
+            files = {}
+            
+            snapshots = [(data, False)] if data else []
+            snapshots += [(snapshot, True) for snapshot in deltas]
+            for snapshot, delta in snapshots:
+                for name, content in snapshot.items():
+                    filename = checkpoint_filename(name, next_sequence(filenames, name), delta)
+                    filenames.append(filename)
+                    files[f"{self.directory}/{filename}"] = content
+                    
+            # Уплотнение: предыдущие базы и дельты больше не нужны
+            deletions = []
+            if data:
+                _, obsolete = checkpoint_chains(filenames)
+                deletions = [f"{self.directory}/{filename}" for filename in obsolete if filename in existing]
                 
-            # Сохранение в истории
-            history_path = f"ai_progress/history/{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            self.repo.create_file(
-                history_path,
-                f"Historical save - {commit_message}",
-                serialized_data
-            )
-            
+            self._commit(commit_message, files=files, deletions=deletions)
             return True
             
         except Exception as e:
@@ -74,89 +80,86 @@ class GitHubStorage:
         Загружает последнее сохраненное состояние
         
         Returns:
-            Dict или None: Загруженные данные или None в случае ошибки
+            Dict или None: Имя агента -> [байты базы, байты дельт] (или данные
+            старого JSON-формата), None в случае ошибки
         """
         try:
-            contents = self.repo.get_contents("ai_progress/current_state.json")
-            decoded_content = base64.b64decode(contents.content).decode()
-            return json.loads(decoded_content)
+            checkpoints = self._read_chains(self.directory)
+            if checkpoints:
+                return checkpoints
+            
+            # Старый формат: одно JSON-состояние
+            files = self._list_files(self.directory)
+            if 'current_state.json' not in files:
+                return None
+            data = json.loads(self._read_blob(files['current_state.json']).decode())
+            return json.loads(data) if isinstance(data, str) else data
         except Exception as e:
             print(f"Error loading from GitHub: {str(e)}")
             return None
             
     def get_progress_history(self, limit: int = 10) -> list:
         """
-        Получает историю сохранений
+        Получает историю сохранений: базу и дельты текущих цепочек
         
         Args:
             limit: Максимальное количество записей
             
         Returns:
-            list: Список исторических записей
+            list: Список записей (агент, номер, тип) от новых к старым
         """
         try:
-            contents = self.repo.get_contents("ai_progress/history")
+            chains, _ = checkpoint_chains(self._list_files(self.directory))
             history = []
-            
-            for content in sorted(contents, key=lambda x: x.path, reverse=True)[:limit]:
-                try:
-                    decoded_content = base64.b64decode(content.content).decode()
-                    data = json.loads(decoded_content)
-                    history.append({
-                        'timestamp': content.path.split('/')[-1].split('.')[0],
-                        'data': data
-                    })
-                except:
-                    continue
+            for name, chain in chains.items():
+                for filename in chain:
+                    seq, kind = filename.split('.')[-2:]
+                    history.append({'agent': name, 'sequence': int(seq), 'kind': kind})
                     
-            return history
+            return sorted(history, key=lambda x: x['sequence'], reverse=True)[:limit]
             
         except Exception as e:
             print(f"Error getting history: {str(e)}")
             return []
             
-    def clean_old_history(self, keep_last: int = 100):
+    def clean_old_history(self, keep_last: int = 0):
         """
-        Очищает старые исторические записи
+        Удаляет полные копии старого формата из ai_progress/history одним коммитом
         
         Args:
             keep_last: Количество последних записей для сохранения
         """
         try:
-            contents = self.repo.get_contents("ai_progress/history")
-            sorted_contents = sorted(contents, key=lambda x: x.path)
-            
-            if len(sorted_contents) > keep_last:
-                for content in sorted_contents[:-keep_last]:
-                    self.repo.delete_file(
-                        content.path,
-                        f"Remove old history - {content.path}",
-                        content.sha
-                    )
+            files = self._list_files(f"{self.directory}/history", recursive=True)
+            entries = sorted({path.split('/')[0] for path in files})
+            removed = set(entries[:max(0, len(entries) - keep_last)])
+            
+            deletions = [f"{self.directory}/history/{path}" for path in files
+                         if path.split('/')[0] in removed]
+            if deletions:
+                self._commit("Remove old history", deletions=deletions)
                     
         except Exception as e:
             print(f"Error cleaning history: {str(e)}")
             
     def backup_progress(self) -> bool:
         """
-        Создает резервную копию текущего состояния
+        Создает резервную копию текущего состояния (копирует ссылки на blob без скачивания)
         
         Returns:
             bool: Успешность операции
         """
         try:
-            # Загружаем текущее состояние
-            current_state = self.load_progress()
-            if not current_state:
+            files = self._list_files(self.directory)
+            chains, _ = checkpoint_chains(files)
+            if not chains:
                 return False
                 
             # Создаем бэкап
-            backup_path = f"ai_progress/backups/backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            self.repo.create_file(
-                backup_path,
-                "Create backup",
-                json.dumps(current_state, indent=2)
-            )
+            backup_dir = f"{self.directory}/backups/backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            copies = {f"{backup_dir}/{filename}": files[filename]
+                      for chain in chains.values() for filename in chain}
+            self._commit("Create backup", copies=copies)
             
             return True
             
@@ -175,18 +178,75 @@ class GitHubStorage:
             bool: Успешность операции
         """
         try:
-            backup_path = f"ai_progress/backups/backup_{backup_timestamp}.json"
-            contents = self.repo.get_contents(backup_path)
-            
-            decoded_content = base64.b64decode(contents.content).decode()
-            backup_data = json.loads(decoded_content)
+            backup_files = self._list_files(f"{self.directory}/backups/backup_{backup_timestamp}")
+            backup_chains, _ = checkpoint_chains(backup_files)
+            if not backup_chains:
+                return False
             
-            # Восстанавливаем состояние
-            return self.save_progress(
-                backup_data,
-                f"Restore from backup {backup_timestamp}"
-            )
+            # Восстанавливаем состояние: цепочки бэкапа заменяют текущие
+            current = self._list_files(self.directory)
+            copies = {f"{self.directory}/{filename}": backup_files[filename]
+                      for chain in backup_chains.values() for filename in chain}
+            deletions = [f"{self.directory}/{filename}" for filename in current
+                         if filename.endswith(('.ckpt', '.delta')) and
+                         f"{self.directory}/{filename}" not in copies]
+            self._commit(f"Restore from backup {backup_timestamp}", copies=copies, deletions=deletions)
+            return True
             
         except Exception as e:
             print(f"Error restoring from backup: {str(e)}")
             return False
+            
+    def _list_files(self, directory: str, recursive: bool = False) -> Dict[str, str]:
+        """Файлы каталога (путь относительно каталога -> sha blob) за один запрос"""
+        branch = self.repo.get_branch(self.repo.default_branch)
+        tree = self.repo.get_git_tree(branch.commit.sha, recursive=True)
+        prefix = directory + '/'
+        files = {}
+        for element in tree.tree:
+            if element.type != 'blob' or not element.path.startswith(prefix):
+                continue
+            path = element.path[len(prefix):]
+            if recursive or '/' not in path:
+                files[path] = element.sha
+        return files
+        
+    def _read_blob(self, sha: str) -> bytes:
+        """Содержимое blob (в отличие от contents API работает и для файлов больше 1 МБ)"""
+        return base64.b64decode(self.repo.get_git_blob(sha).content)
+        
+    def _read_chains(self, directory: str) -> Dict[str, list]:
+        """Цепочки контрольных точек каталога: имя агента -> [база, дельты] в байтах"""
+        files = self._list_files(directory)
+        chains, _ = checkpoint_chains(files)
+        return {name: [self._read_blob(files[filename]) for filename in chain]
+                for name, chain in chains.items()}
+        
+    def _commit(self, message: str, files: Optional[Dict[str, bytes]] = None,
+                copies: Optional[Dict[str, str]] = None, deletions: Sequence[str] = ()) -> None:
+        """
+        Один коммит с новыми файлами, копиями существующих blob и удалениями
+        
+        Args:
+            message: Сообщение коммита
+            files: Путь -> содержимое
+            copies: Путь -> sha существующего blob
+            deletions: Удаляемые пути
+        """
+        ref = self.repo.get_git_ref(f"heads/{self.repo.default_branch}")
+        parent = self.repo.get_git_commit(ref.object.sha)
+        
+        elements = []
+        for path, content in (files or {}).items():
+            blob = self.repo.create_git_blob(base64.b64encode(content).decode(), 'base64')
+            elements.append(InputGitTreeElement(path, '100644', 'blob', sha=blob.sha))
+        for path, sha in (copies or {}).items():
+            elements.append(InputGitTreeElement(path, '100644', 'blob', sha=sha))
+        for path in deletions:
+            elements.append(InputGitTreeElement(path, '100644', 'blob', sha=None))
+        if not elements:
+            return
+            
+        tree = self.repo.create_git_tree(elements, parent.tree)
+        commit = self.repo.create_git_commit(message, tree, [parent])
+        ref.edit(commit.sha)
@@ -0,0 +1,105 @@
+# storage/local_storage.py
+
+import os
+import json
+import tempfile
+from typing import Optional, Dict, List, Sequence, Union
+from .checkpoint_files import checkpoint_filename, checkpoint_chains, next_sequence
+
+LEGACY_STATE_FILE = 'current_state.json'
+POLICY_SUFFIX = '.policy'
+
+class LocalStorage:
+    def __init__(self, directory: Optional[str] = None):
+        """Инициализация локального хранилища контрольных точек"""
+        self.directory = directory or os.getenv('AI_STORAGE_DIR', 'ai_progress')
+
+    def save_progress(self, data: Optional[Dict[str, bytes]] = None,
+                      deltas: Sequence[Dict[str, bytes]] = ()) -> bool:
+        """
+        Атомарно сохраняет контрольные точки агентов
+
+        Каждая точка пишется во временный файл рядом с целевым и переименовывается
+        через os.replace, поэтому читатели никогда не видят недописанный файл.
+        Новая база (уплотнение) получает номер больше всех дельт, после чего
+        предыдущие база и дельты удаляются.
+
+        Args:
+            data: Имя агента -> байты базовой контрольной точки
+            deltas: Дельты (имя агента -> байты) в порядке создания
+
+        Returns:
+            bool: Успешность операции
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            snapshots = [(data, False)] if data else []
+            snapshots += [(snapshot, True) for snapshot in deltas]
+            for snapshot, delta in snapshots:
+                for name, content in snapshot.items():
+                    seq = next_sequence(os.listdir(self.directory), name)
+                    self._write_atomic(checkpoint_filename(name, seq, delta), content)
+
+            if data:
+                _, obsolete = checkpoint_chains(os.listdir(self.directory))
+                for filename in obsolete:
+                    os.unlink(os.path.join(self.directory, filename))
+
+            return True
+
+        except Exception as e:
+            print(f"Error saving to {self.directory}: {str(e)}")
+            return False
+
+    def load_progress(self) -> Optional[Dict[str, Union[List[str], Dict]]]:
+        """
+        Находит последнее сохраненное состояние
+
+        Returns:
+            Dict или None: Имя агента -> [путь к базе, пути к дельтам] (базу можно
+            отобразить в память), либо данные старого JSON-формата
+        """
+        if os.path.isdir(self.directory):
+            chains, _ = checkpoint_chains(os.listdir(self.directory))
+            if chains:
+                return {name: [os.path.join(self.directory, filename) for filename in chain]
+                        for name, chain in chains.items()}
+
+        legacy_path = os.path.join(self.directory, LEGACY_STATE_FILE)
+        if not os.path.exists(legacy_path):
+            return None
+        try:
+            with open(legacy_path) as f:
+                data = json.load(f)
+            return json.loads(data) if isinstance(data, str) else data
+        except Exception as e:
+            print(f"Error loading from {legacy_path}: {str(e)}")
+            return None
+
+    def save_policies(self, data: Dict[str, bytes]) -> bool:
+        """Атомарно сохраняет файлы политик (имя агента -> байты)"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for name, content in data.items():
+                self._write_atomic(name + POLICY_SUFFIX, content)
+            return True
+        except Exception as e:
+            print(f"Error saving policies to {self.directory}: {str(e)}")
+            return False
+
+    def load_policies(self) -> Dict[str, str]:
+        """Пути к файлам политик: имя агента -> путь"""
+        if not os.path.isdir(self.directory):
+            return {}
+        return {name[:-len(POLICY_SUFFIX)]: os.path.join(self.directory, name)
+                for name in os.listdir(self.directory) if name.endswith(POLICY_SUFFIX)}
+
+    def _write_atomic(self, filename: str, content: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, os.path.join(self.directory, filename))
+        except:
+            os.unlink(tmp_path)
+            raise
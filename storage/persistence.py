@@ -0,0 +1,172 @@
+# storage/persistence.py
+
+import threading
+import time
+from typing import Optional, Dict, List, Any, Callable
+
+class PersistenceManager:
+    def __init__(self, local, snapshot: Callable[[bool], Dict[str, bytes]], remote=None,
+                 interval: float = 60.0, max_updates: int = 10000,
+                 remote_interval: float = 600.0, compact_every: int = 20):
+        """
+        Отложенное пакетное сохранение прогресса ИИ
+
+        Изменения только отмечаются (mark_dirty); фоновый поток делает снимок и
+        пишет его в локальное хранилище, когда с первого несохраненного изменения
+        прошло interval секунд или накопилось max_updates обновлений.
+
+        Обычно пишется дельта - только измененные с прошлого снимка наборы;
+        каждые compact_every дельт (и при первом сохранении) цепочка уплотняется
+        в новую базу. Удаленное хранилище (например, GitHubStorage) получает
+        накопленные база и дельты одним пакетом не чаще чем раз в remote_interval
+        секунд.
+
+        Args:
+            local: Локальное хранилище с методами save_progress/load_progress
+            snapshot: Функция snapshot(delta), возвращающая контрольные точки агентов
+            remote: Необязательное удаленное хранилище с тем же интерфейсом
+        """
+        self.local = local
+        self.remote = remote
+        self.snapshot = snapshot
+        self.interval = interval
+        self.max_updates = max_updates
+        self.remote_interval = remote_interval
+        self.compact_every = compact_every
+
+        self.pending_updates = 0
+        self.dirty_since: Optional[float] = None
+        self.deltas_since_base: Optional[int] = None  # None - следующий снимок будет базой
+        self.last_remote_save = time.time()
+
+        # Еще не отправленные в удаленное хранилище база и дельты
+        self.remote_base: Optional[Dict[str, bytes]] = None
+        self.remote_deltas: List[Dict[str, bytes]] = []
+
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Загружает состояние из локального хранилища (без сетевых запросов)"""
+        return self.local.load_progress()
+
+    def fetch_remote(self) -> Optional[Dict[str, Any]]:
+        """
+        Скачивает состояние из удаленного хранилища и кэширует его локально
+
+        Returns:
+            Dict или None: Состояние в формате load (пути к локальным файлам)
+        """
+        if self.remote is None:
+            return None
+        data = self.remote.load_progress()
+        if not data:
+            return None
+
+        chains = {name: chain for name, chain in data.items() if isinstance(chain, list)}
+        if not chains:
+            return data  # Старый JSON-формат не кэшируется
+
+        for name, chain in chains.items():
+            self.local.save_progress({name: chain[0]}, deltas=[{name: delta} for delta in chain[1:]])
+        return self.local.load_progress()
+
+    def mark_dirty(self, updates: int = 1) -> None:
+        """Отмечает изменения состояния, которые нужно сохранить"""
+        with self._condition:
+            self.pending_updates += updates
+            if self.dirty_since is None:
+                self.dirty_since = time.time()
+            if self.pending_updates >= self.max_updates:
+                self._condition.notify()
+
+    def request_flush(self) -> None:
+        """Просит фоновый поток сохранить изменения, не дожидаясь интервала"""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify()
+
+    def flush(self, force_remote: bool = False) -> bool:
+        """Сохраняет снимок немедленно в вызывающем потоке"""
+        with self._condition:
+            remote_pending = self.remote_base is not None or self.remote_deltas
+            dirty = self.dirty_since is not None
+            if not dirty and not (force_remote and remote_pending):
+                return True
+            self.pending_updates = 0
+            self.dirty_since = None
+            self._flush_requested = False
+
+        if not dirty:
+            return self._write_remote(force_remote)
+        return self._write(force_remote)
+
+    def stop(self) -> None:
+        """Останавливает фоновый поток и сохраняет всё, включая удаленную копию"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush(force_remote=True)
+
+    def _due(self) -> bool:
+        if self.dirty_since is None:
+            return False
+        return (self._flush_requested or self.pending_updates >= self.max_updates or
+                time.time() - self.dirty_since >= self.interval)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped and not self._due():
+                    timeout = self.interval
+                    if self.dirty_since is not None:
+                        timeout = max(0.0, self.dirty_since + self.interval - time.time())
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+            self.flush()
+
+    def _write(self, force_remote: bool) -> bool:
+        delta = self.deltas_since_base is not None and self.deltas_since_base < self.compact_every
+        try:
+            data = self.snapshot(delta)
+        except Exception as e:
+            print(f"Error creating AI state snapshot: {str(e)}")
+            return False
+
+        if delta:
+            success = self.local.save_progress(deltas=[data])
+            self.remote_deltas.append(data)
+        else:
+            success = self.local.save_progress(data)
+            self.remote_base = data
+            self.remote_deltas = []
+
+        # Снимок сбросил отметки изменений: при ошибке записи цепочка неполна,
+        # поэтому следующим снимком будет новая база
+        if not success:
+            self.deltas_since_base = None
+        else:
+            self.deltas_since_base = self.deltas_since_base + 1 if delta else 0
+
+        self._write_remote(force_remote)
+        return success
+
+    def _write_remote(self, force_remote: bool) -> bool:
+        if self.remote is None or (self.remote_base is None and not self.remote_deltas):
+            return True
+
+        now = time.time()
+        if not force_remote and now - self.last_remote_save < self.remote_interval:
+            return True
+
+        if not self.remote.save_progress(self.remote_base, deltas=self.remote_deltas):
+            return False
+        self.last_remote_save = now
+        self.remote_base = None
+        self.remote_deltas = []
+        return True
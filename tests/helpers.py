@@ -0,0 +1,15 @@
+# tests/helpers.py
+import numpy as np
+
+
+def store_table(store):
+    """Строки хранилища по ключу: (сожаления, сумма стратегий)"""
+    return {key: (store.regrets[store.row_slice(row)].copy(), store.strategy_sum[store.row_slice(row)].copy())
+            for key, row in store.index.items()}
+
+
+def assert_same_tables(left, right):
+    assert left.keys() == right.keys()
+    for key, (regrets, strategy_sum) in left.items():
+        np.testing.assert_array_equal(regrets, right[key][0])
+        np.testing.assert_array_equal(strategy_sum, right[key][1])
@@ -0,0 +1,60 @@
+# tests/test_checkpoint.py
+import pytest
+
+from ai.checkpoint import CheckpointError
+from ai.mccfr_agent import MCCFRAgent
+from .helpers import store_table, assert_same_tables
+
+
+def trained_chain(save):
+    """Тренирует агента, сохраняя базовую точку и две дельты через save"""
+    agent = MCCFRAgent()
+    agent.rng.seed(7)
+    agent.train(30)
+    chain = [save(agent, False)]
+    for _ in range(2):
+        agent.train(30)
+        chain.append(save(agent, True))
+    return agent, chain
+
+
+def test_delta_chain_round_trip():
+    """База и дельты, примененные по порядку, восстанавливают таблицы агента"""
+    agent, chain = trained_chain(lambda agent, delta: agent.save_state(delta=delta))
+
+    restored = MCCFRAgent()
+    restored.load_state(chain)
+
+    assert restored.iterations == agent.iterations == 90
+    assert_same_tables(store_table(restored.store), store_table(agent.store))
+
+
+def test_delta_chain_round_trip_files(tmp_path):
+    """То же для сжатых файлов и базы, отображенной в память"""
+    def save(agent, delta):
+        path = str(tmp_path / f"checkpoint_{len(list(tmp_path.iterdir()))}.bin")
+        agent.save_state(path, compress=delta, delta=delta)
+        return path
+
+    agent, chain = trained_chain(save)
+
+    restored = MCCFRAgent()
+    restored.load_state(chain)
+
+    assert restored.iterations == agent.iterations
+    assert_same_tables(store_table(restored.store), store_table(agent.store))
+
+
+def test_delta_is_smaller_than_base():
+    """Дельта содержит только строки, измененные после прошлого сохранения"""
+    agent, chain = trained_chain(lambda agent, delta: agent.save_state(delta=delta))
+    agent.save_state()
+    assert len(agent.save_state(delta=True)) < len(chain[0])
+
+
+def test_truncated_checkpoint_rejected():
+    agent = MCCFRAgent()
+    agent.train(5)
+    data = agent.save_state()
+    with pytest.raises(CheckpointError):
+        MCCFRAgent().load_state(data[:10])
@@ -0,0 +1,49 @@
+# tests/test_fantasy_solver.py
+import random
+import time
+
+from ai.cards import make_card
+from ai.evaluator import HandEvaluator, QUADS
+from ai.fantasy_solver import FantasySolver
+from ai.game_rules import PineappleRules
+
+
+def assert_layout(cards, layout):
+    """Раскладка использует ровно переданные карты и не является мертвой рукой"""
+    used = layout['top'] + layout['middle'] + layout['bottom'] + layout['discard']
+    assert sorted(used) == sorted(cards)
+    assert PineappleRules().is_valid_hand(layout['top'], layout['middle'], layout['bottom'])
+
+
+def test_solves_fantasy_hand():
+    cards = random.Random(2).sample(range(52), 14)
+    stats = {}
+    layout = FantasySolver().solve(cards, time_budget=None, stats=stats)
+    assert_layout(cards, layout)
+    assert stats['complete']
+
+
+def test_keeps_quads():
+    """Каре дает бонус и повторную фантазию, поэтому попадает в среднюю или нижнюю линию"""
+    aces = [make_card(12, suit) for suit in range(4)]
+    rest = random.Random(5).sample(range(48), 10)  # Карты 48..51 - тузы
+    layout = FantasySolver().solve(aces + rest, time_budget=None)
+    assert_layout(aces + rest, layout)
+    category = max(HandEvaluator.category(HandEvaluator.evaluate_middle(layout['middle'])),
+                   HandEvaluator.category(HandEvaluator.evaluate_bottom(layout['bottom'])))
+    assert category >= QUADS
+
+
+def test_deadline_returns_best_found():
+    """С малым лимитом поиск прерывается, но возвращает допустимую раскладку"""
+    cards = random.Random(1).sample(range(52), 17)
+    stats = {}
+    started = time.perf_counter()
+    layout = FantasySolver().solve(cards, time_budget=0.01, stats=stats)
+    assert time.perf_counter() - started < 0.5
+    assert_layout(cards, layout)
+    assert stats['layouts'] > 0
+
+
+def test_too_few_cards():
+    assert FantasySolver().solve(list(range(12))) is None
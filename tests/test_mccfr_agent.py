@@ -0,0 +1,31 @@
+# tests/test_mccfr_agent.py
+import pytest
+
+from ai.mccfr_agent import MCCFRAgent
+
+EMPTY_TABLE = {'top': [None] * 3, 'middle': [None] * 5, 'bottom': [None] * 5}
+
+
+def make_state(hand):
+    return {'hand': [{'rank': r, 'suit': s} for r, s in hand], 'table': EMPTY_TABLE}
+
+
+def test_malformed_table_gets_own_error():
+    """Испорченный стол в пакете получает свою ошибку, остальные - ходы"""
+    agent = MCCFRAgent()
+    good = make_state([('A', '♠'), ('A', '♥'), ('K', '♦'), ('7', '♣'), ('2', '♥')])
+    broken = [{'hand': [60], 'table': EMPTY_TABLE}, {'hand': [{'rank': 'Z', 'suit': '♠'}], 'table': EMPTY_TABLE}]
+
+    errors = {}
+    actions = agent.get_actions([good] + broken, seed=1, time_budget=0.5, errors=errors)
+
+    assert actions[0] is not None
+    assert actions[1] is None and actions[2] is None
+    assert sorted(errors) == [1, 2]
+
+
+def test_out_of_range_card_rejected():
+    """Номер карты вне 0..51 отклоняется как ValueError, а не IndexError"""
+    agent = MCCFRAgent()
+    with pytest.raises(ValueError):
+        agent.get_action({'hand': [60], 'table': EMPTY_TABLE})
@@ -0,0 +1,86 @@
+# tests/test_parallel_trainer.py
+import numpy as np
+
+from ai.mccfr_agent import MCCFRAgent
+from ai.parallel_trainer import ParallelTrainer
+from .helpers import store_table, assert_same_tables
+
+
+def base_agent():
+    agent = MCCFRAgent()
+    agent.rng.seed(3)
+    agent.train(20)
+    return agent
+
+
+def worker_changes(agent, seed, iterations=20):
+    """Раунд рабочего процесса на реплике таблиц агента: (реплика, приращения)"""
+    worker = MCCFRAgent()
+    worker.store = agent.store.copy()
+    worker.store.track_changes()
+    worker.rng.seed(seed)
+    worker.train(iterations)
+    return worker.store, worker.store.changes()
+
+
+def test_single_merge_matches_serial():
+    """Слияние приращений одного процесса дает те же таблицы, что и тренировка на месте"""
+    agent = base_agent()
+    _, delta = worker_changes(agent, seed=11)
+
+    serial = base_agent()
+    serial.rng.seed(11)
+    serial.train(20)
+
+    agent.merge(delta, 20)
+    assert agent.iterations == serial.iterations
+    assert_same_tables(store_table(agent.store), store_table(serial.store))
+
+
+def test_merge_sums_worker_changes():
+    """Приращения нескольких процессов складываются построчно, новые строки - по ключу"""
+    agent = base_agent()
+    before = store_table(agent.store)
+    replicas = [worker_changes(agent, seed) for seed in (11, 12)]
+    for _, delta in replicas:
+        agent.merge(delta, 20)
+
+    expected = {key: [regrets.copy(), strategy_sum.copy()] for key, (regrets, strategy_sum) in before.items()}
+    for replica, _ in replicas:
+        for key, (regrets, strategy_sum) in store_table(replica).items():
+            base = before.get(key, (0.0, 0.0))
+            row = expected.setdefault(key, [np.zeros_like(regrets), np.zeros_like(strategy_sum)])
+            row[0] += regrets - base[0]
+            row[1] += strategy_sum - base[1]
+
+    merged = store_table(agent.store)
+    assert merged.keys() == expected.keys()
+    for key, (regrets, strategy_sum) in expected.items():
+        np.testing.assert_allclose(merged[key][0], regrets, rtol=1e-5, atol=1e-4)
+        np.testing.assert_allclose(merged[key][1], strategy_sum, rtol=1e-5, atol=1e-4)
+
+
+def test_replica_follows_merged_store():
+    """Реплика, отменившая свой раунд и применившая все приращения, совпадает с агентом"""
+    agent = base_agent()
+    replicas = [worker_changes(agent, seed) for seed in (11, 12)]
+    for _, delta in replicas:
+        agent.merge(delta, 20)
+
+    replica = replicas[0][0]
+    replica.rollback()
+    for _, delta in replicas:
+        replica.merge(delta)
+    assert_same_tables(store_table(replica), store_table(agent.store))
+
+
+def test_parallel_training_counts_iterations():
+    agent = base_agent()
+    rows = len(agent.store)
+    assert ParallelTrainer(agent, processes=2, sync_every=10).train(50) == 50
+    assert agent.iterations == 70
+    assert len(agent.store) > rows
+
+
+def test_process_count_clamped():
+    assert ParallelTrainer(MCCFRAgent(), processes=-3).processes == 1